@@ -1,14 +1,26 @@
 import io
+import os
 import cv2
+import numpy as np
 import time
 import pygame
 import threading
-from mp_solutions import MPipe
-from efficient_tracker import EfficientTracker
+from lib.shm_transport import FrameProducer
+from lib.rules import RuleSet, DEFAULT_RULES, detections_to_array
+
+# Inference server shared memory address, infer locally if not set
+SHM_ADDRESS = os.getenv("SHM_ADDRESS")
+
+cwidth = 640
+cheight = 480
 
 # Engine instances
-tracker = EfficientTracker(timeout=100)
-mp = MPipe(debug=True, gpu=True)
+if SHM_ADDRESS:
+    # Hand raw frames to the co-located server, no jpeg encode nor http
+    producer = FrameProducer(SHM_ADDRESS, "cam0", cwidth, cheight, authkey=(os.getenv("TKN") or "snlrdevops").encode("utf-8"))
+else:
+    from lib.mp_solutions import MPipe
+    mp = MPipe(debug=True, segmenter=False)
 
 playing = False
 
@@ -26,8 +38,6 @@ def play(file):
         time.sleep(1)
     playing = False
     
-cwidth = 640
-cheight = 480
 
 # Camera instance
 cap = cv2.VideoCapture(0) # Use default camera
@@ -50,6 +60,10 @@ gx2 = round(gx1 + (width*cwidth))
 gy1 = round((cheight - (height*cheight)) / 2)
 gy2 = round((gy1 + (height*cheight)))
 
+# Test only: Geofence rules (normalized bbox), streak counters
+rules = RuleSet(DEFAULT_RULES, [gx1 / cwidth, gy1 / cheight, gx2 / cwidth, gy2 / cheight])
+streaks = np.zeros(len(rules.names), dtype=np.int32)
+
 # Colors
 green = (0,255,0)
 blue = (255,0,0)
@@ -63,20 +77,24 @@ while True:
             print("Can't access to frame capture")
             break
 
-        # Encode image
-        is_success, encoded_image = cv2.imencode(".jpg", frame)
-        if not is_success:
-            print("Error al codificar frame")
-            continue
-        
         # Image size
         h, w = frame.shape[:2]
 
-        # Convert frame to blob
-        image_blob = io.BytesIO(encoded_image.tobytes())
+        if SHM_ADDRESS:
+            # Call body pose detection on the server through shared memory
+            results = producer.infer(frame, normalized=False)
+        else:
+            # Encode image
+            is_success, encoded_image = cv2.imencode(".jpg", frame)
+            if not is_success:
+                print("Error al codificar frame")
+                continue
 
-        # Call body pose detection method
-        results = mp.bodypose_detection(image_blob, normalized=False)
+            # Convert frame to blob
+            image_blob = io.BytesIO(encoded_image.tobytes())
+
+            # Call body pose detection method
+            results = mp.bodypose_detection(image_blob, normalized=False)
 
         # Draw bed
         cv2.rectangle(frame, (gx1, gy1), (gx2, gy2), blue, 2)
@@ -84,8 +102,6 @@ while True:
         # bbox
         # minx, maxx, miny, maxy = 10000, 0, 10000, 0
         
-        risk = False
-        lw, rw, le, re = None, None, None, None
         # draw keypoints
         for kp in results[0]["keypoints"]:
             # Retrieve coordinates
@@ -93,35 +109,20 @@ while True:
                 
             if ty > h or tx > w:
                 continue
-            
-            
-            if kp["name"] == "leftWrist":
-                lw = ty
-            if kp["name"] == "rightWrist":
-                rw = ty
-            if kp["name"] == "leftElbow":
-                le = ty
-            if kp["name"] == "rightElbow":
-                re = ty
-                
-            # set max and min
-            if tx > gx1 and tx < gx2 and ty > gy1 and ty < gy2:
-                cv2.circle(frame, (round(tx), round(ty)), 4, green, -1)
-            else:
-                # Detected patient in risk
-                risk = True
-                cv2.circle(frame, (round(tx), round(ty)), 4, red, -1)
-                print(kp)
                 
-        if lw is not None and le is not None:
-            if lw < le:
-                threading.Thread(target=play, args=("./attention.mp3",), daemon=False).start()
-        if rw is not None and re is not None:
-            if rw < re:
-                threading.Thread(target=play, args=("./attention.mp3",), daemon=False).start()
-                
-                
-        if risk:
+            color = green if tx > gx1 and tx < gx2 and ty > gy1 and ty < gy2 else red
+            cv2.circle(frame, (round(tx), round(ty)), 4, color, -1)
+        
+        # Fence rules on normalized landmarks
+        landmarks = detections_to_array(results)
+        landmarks[..., 0] /= w
+        landmarks[..., 1] /= h
+        fired = rules.evaluate(landmarks, streaks)
+        
+        if "wrist_above_elbow" in fired:
+            threading.Thread(target=play, args=("./attention.mp3",), daemon=False).start()
+        if "outside_fence" in fired:
+            # Detected patient in risk
             threading.Thread(target=play, args=("./warn.mp3",), daemon=False).start()
             
         # Show frame in a window
@@ -134,4 +135,6 @@ while True:
         print(f"Error en bodypose_detection: {e}")
 
 cap.release()
+if SHM_ADDRESS:
+    producer.close()
 cv2.destroyAllWindows()
\ No newline at end of file
@@ -0,0 +1,404 @@
+import time
+import socket
+import argparse
+import threading
+from collections import deque
+import cv2
+import requests
+from lib.mp_solutions import MPipe
+from lib.scheduler import FairScheduler
+from lib.fences import load_fences, find_fence
+from lib.rules import RuleBook
+from lib.incident_log import IncidentLog
+from lib.pose_recorder import PoseRecorder
+from lib.keypoints import encode_frame
+
+
+# Seconds of inference timestamps kept for the fps stats
+FPS_WINDOW = 5.0
+
+
+class VideoSource:
+    # Constructor
+    def __init__(self, id, uri, width=640, height=480):
+        """
+        Capture thread keeping only the latest frame of a source
+        ---
+        <br/>
+        Args:
+            id (str): Source id (matches the fence "id")
+            uri (str): Device index, video file or stream url. Files loop at their own fps to simulate a live stream.
+            width (int, optional): Capture width. Defaults to 640.
+            height (int, optional): Capture height. Defaults to 480.
+        """
+        self.id = id
+        self.uri = uri
+        self.is_file = not uri.isdigit() and "://" not in uri
+        self.cap = cv2.VideoCapture(int(uri) if uri.isdigit() else uri)
+        if not self.cap.isOpened():
+            raise ValueError(f"Can't open video source '{uri}'.")
+        if not self.is_file:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+        self.lock = threading.Lock()
+        self.frame = None
+        self.frame_ts = 0.0
+        self.running = False
+        self.on_frame = None
+        # Stats
+        self.inferences = deque()
+        self.lag = 0.0
+        self.risk = None
+
+
+    def start(self, on_frame):
+        """
+        Start capturing, on_frame(id) is called for every new frame
+        """
+        self.on_frame = on_frame
+        self.running = True
+        threading.Thread(target=self._capture, daemon=True).start()
+        return self
+
+
+    def _capture(self):
+        interval = 1.0 / self.fps
+        next_ts = time.time()
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                if self.is_file:
+                    # Loop simulated stream
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                print(f"[{self.id}] Can't access to frame capture")
+                time.sleep(1)
+                continue
+            with self.lock:
+                self.frame = frame
+                self.frame_ts = time.time()
+            self.on_frame(self.id)
+            if self.is_file:
+                # Pace file playback as a live camera
+                next_ts += interval
+                time.sleep(max(0.0, next_ts - time.time()))
+
+
+    def count_inference(self, now):
+        """
+        Keep the inference timestamps of the last FPS_WINDOW seconds
+        """
+        self.inferences.append(now)
+        while self.inferences and now - self.inferences[0] > FPS_WINDOW:
+            self.inferences.popleft()
+
+
+    def latest(self):
+        """
+        Latest frame and its capture timestamp
+        """
+        with self.lock:
+            return self.frame, self.frame_ts
+
+
+    def stop(self):
+        self.running = False
+        self.cap.release()
+
+
+
+class KeypointUploader:
+    # Constructor
+    def __init__(self, url, node, on_risk, on_unsent, interval=0.1, max_batch=256, max_pending=2048, timeout=5.0):
+        """
+        Batches landmark frames of every source into /vision/keypoints requests
+        ---
+        <br/>
+        Frames that can't be delivered (failed request or pending queue overflow) are handed to
+        `on_unsent` so fence rules still run locally while upstream is unreachable.
+        <br/>
+        Args:
+            url (str): Server base url, e.g. http://central:5000
+            node (str): Edge node id
+            on_risk (callable): on_risk(source, fired rule names) for every frame evaluated upstream
+            on_unsent (callable): on_unsent(source, landmarks) for every frame not evaluated upstream
+            interval (float, optional): Seconds between requests. Defaults to 0.1.
+            max_batch (int, optional): Frames per request. Defaults to 256.
+            max_pending (int, optional): Frames kept while upstream is slow, oldest dropped first. Defaults to 2048.
+            timeout (float, optional): Request timeout in seconds. Defaults to 5.0.
+        """
+        self.url = url.rstrip("/") + "/vision/keypoints"
+        self.node = node
+        self.on_risk = on_risk
+        self.on_unsent = on_unsent
+        self.interval = interval
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.pending = deque(maxlen=max_pending)
+        self.session = requests.Session()
+        self.running = False
+        # Last request failed, callers check frames locally until upstream answers again
+        self.offline = False
+        # Stats
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.requests = 0
+
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._send, daemon=True).start()
+        return self
+
+
+    def put(self, source, landmarks, ts, checked=False):
+        """
+        Queue a frame, `checked` when fence rules already ran locally for it
+        """
+        with self.lock:
+            dropped = self.pending[0] if len(self.pending) == self.pending.maxlen else None
+            self.pending.append((source, landmarks, ts, checked))
+            if dropped is not None:
+                self.dropped += 1
+        if dropped is not None and not dropped[3]:
+            self.on_unsent(dropped[0], dropped[1])
+
+
+    def _send(self):
+        while self.running:
+            time.sleep(self.interval)
+            with self.lock:
+                batch = [self.pending.popleft() for _ in range(min(self.max_batch, len(self.pending)))]
+            if not batch:
+                continue
+            try:
+                # Encoding happens here, off the detector workers
+                frames = [encode_frame(source, landmarks, ts) for source, landmarks, ts, _ in batch]
+                res = self.session.post(self.url, json={ "node": self.node, "frames": frames }, timeout=self.timeout)
+                res.raise_for_status()
+                self.offline = False
+                self.requests += 1
+                self.sent += len(batch)
+                for (source, landmarks, _, checked), frame in zip(batch, res.json()["frames"]):
+                    if "error" in frame:
+                        # Its node failed (router batches span nodes), checked here
+                        self.sent -= 1
+                        self.failed += 1
+                        if not checked:
+                            self.on_unsent(source, landmarks)
+                    else:
+                        self.on_risk(frame["source"], frame["risk"])
+            except Exception as err:
+                # Live landmarks, a lost batch is not retried upstream but checked here
+                if not self.offline:
+                    print(f"Upstream error, checking fences locally: {str(err)}")
+                self.offline = True
+                self.failed += len(batch)
+                for source, landmarks, _, checked in batch:
+                    if not checked:
+                        self.on_unsent(source, landmarks)
+
+
+    def stop(self):
+        self.running = False
+
+
+
+class EdgeRunner:
+    # Constructor
+    def __init__(self, sources, workers=1, fences_path="./data/fences.json", risk_boost=4.0, incidents_path=None,
+                 record_path=None, upstream=None, node=None, debug=False):
+        """
+        Headless multi camera monitor sharing a detector pool
+        ---
+        <br/>
+        Args:
+            sources (dict): Source uri by source id
+            workers (int, optional): Detector instances (one MPipe per worker). Defaults to 1.
+            fences_path (str, optional): Fences file. Defaults to "./data/fences.json".
+            risk_boost (float, optional): Inference rate multiplier of sources at risk. Defaults to 4.0.
+            incidents_path (str, optional): Incident log folder, not recorded if not set. Defaults to None.
+            record_path (str, optional): Pose recordings folder, not recorded if not set. Defaults to None.
+            upstream (str, optional): Server url, landmarks are sent to its /vision/keypoints and fence rules,
+                incidents and recording run there. Defaults to None (local checks).
+            node (str, optional): Edge node id sent upstream. Defaults to None (host name).
+            debug (bool, optional): Print model loading. Defaults to False.
+        """
+        self.fences_path = fences_path
+        self.fences = load_fences(fences_path)
+        self.rules = RuleBook(self.fences)
+        self.scheduler = FairScheduler(risk_boost=risk_boost)
+        self.sources = { id: VideoSource(id, uri) for id, uri in sources.items() }
+        self.detectors = [MPipe(debug=debug, segmenter=False) for _ in range(workers)]
+        self.incidents = IncidentLog(incidents_path) if incidents_path else None
+        self.recorder = PoseRecorder(record_path) if record_path else None
+        self.uploader = KeypointUploader(
+            upstream, node or socket.gethostname(), self._upstream_risk, self._local_check
+        ) if upstream else None
+        self.running = False
+
+
+    def start(self):
+        self.running = True
+        if self.uploader is not None:
+            self.uploader.start()
+        for id, source in self.sources.items():
+            if find_fence(self.fences, id) is None:
+                print(f"[{id}] Warning: no fence assigned, monitoring without fence checks.")
+            self.scheduler.register(id)
+            source.start(self.scheduler.mark_ready)
+        for detector in self.detectors:
+            threading.Thread(target=self._work, args=(detector,), daemon=True).start()
+        return self
+
+
+    def _work(self, detector):
+        """
+        Detector worker: infer whichever source the scheduler hands out
+        """
+        while self.running:
+            id = self.scheduler.next(timeout=1.0)
+            if id is None:
+                continue
+            source = self.sources[id]
+            try:
+                frame, frame_ts = source.latest()
+                _, landmarks = detector.bodypose_detection(frame, normalized=True, with_array=True)
+                if self.recorder is not None:
+                    self.recorder.append(id, landmarks, ts=frame_ts)
+                now = time.time()
+                source.count_inference(now)
+                source.lag = now - frame_ts
+                if self.uploader is None:
+                    self._check(source, landmarks)
+                else:
+                    # Upstream unreachable: keep alerting locally, frames still go up once it's back
+                    offline = self.uploader.offline
+                    if offline:
+                        self._check(source, landmarks)
+                    self.uploader.put(id, landmarks, frame_ts, checked=offline)
+            except Exception as err:
+                print(f"[{id}] Bodypose detection error: {str(err)}")
+            finally:
+                self.scheduler.done(id)
+
+
+    def _check(self, source, landmarks):
+        """
+        Fence rules, boosts the source while at risk
+        """
+        fence, risk = self.rules.evaluate(source.id, landmarks)
+        if fence is None:
+            return
+        self.scheduler.set_risk(source.id, bool(risk))
+        for rule in risk:
+            print(f"[{source.id}] The user on the fence: '{fence}', is under high fall risk ({rule}).")
+            self._record(source, rule, fence)
+        source.risk = risk
+
+
+    def _local_check(self, id, landmarks):
+        """
+        Fence rules of a frame upstream couldn't evaluate
+        """
+        source = self.sources.get(id)
+        if source is not None:
+            self._check(source, landmarks)
+
+
+    def _upstream_risk(self, id, risk):
+        """
+        Fence rules evaluated upstream, boosts the source while at risk
+        """
+        source = self.sources.get(id)
+        if source is None:
+            return
+        self.scheduler.set_risk(id, bool(risk))
+        for rule in risk:
+            print(f"[{id}] The user is under high fall risk ({rule}).")
+        source.risk = risk
+
+
+    def _record(self, source, type, fence):
+        if self.incidents is not None:
+            self.incidents.append(source.id, type, { "fence": fence })
+
+
+    def stats(self):
+        """
+        Per source inference fps and lag
+        ---
+        <br/>
+        Returns:
+            dict: { id: { "fps", "lag_ms", "at_risk" } }
+        """
+        now = time.time()
+        stats = {}
+        for id, source in self.sources.items():
+            recent = [ts for ts in list(source.inferences) if now - ts <= FPS_WINDOW]
+            stats[id] = {
+                "fps": len(recent) / FPS_WINDOW,
+                "lag_ms": round(source.lag * 1000, 1),
+                "at_risk": self.scheduler.at_risk(id),
+            }
+        return stats
+
+
+    def report(self, interval=5.0):
+        """
+        Print stats every interval seconds until stopped (Ctrl+C)
+        """
+        try:
+            while self.running:
+                time.sleep(interval)
+                # Pick up fences edited from the dashboard
+                self.fences = load_fences(self.fences_path)
+                self.rules.load(self.fences)
+                for id, st in self.stats().items():
+                    print(f"[{id}] fps: {st['fps']:.1f} lag: {st['lag_ms']}ms{' AT RISK' if st['at_risk'] else ''}")
+                if self.uploader is not None:
+                    print(f"[upstream] sent: {self.uploader.sent} frames in {self.uploader.requests} requests, failed: {self.uploader.failed}, dropped: {self.uploader.dropped}{' OFFLINE' if self.uploader.offline else ''}")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+
+    def stop(self):
+        self.running = False
+        self.scheduler.close()
+        if self.uploader is not None:
+            self.uploader.stop()
+        for source in self.sources.values():
+            source.stop()
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless multi camera fall risk monitor")
+    parser.add_argument("--source", action="append", required=True, metavar="ID=URI",
+                        help="Source id and device index, video file or stream url. Repeat for each camera.")
+    parser.add_argument("--workers", type=int, default=1, help="Detector pool size")
+    parser.add_argument("--fences", default="./data/fences.json", help="Fences file")
+    parser.add_argument("--risk-boost", type=float, default=4.0, help="Inference rate multiplier for sources at risk")
+    parser.add_argument("--incidents", default=None, help="Incident log folder, e.g. ./data/incidents-edge")
+    parser.add_argument("--record", default=None, help="Pose recordings folder, e.g. ./data/poses-edge")
+    parser.add_argument("--upstream", default=None, help="Send landmarks to this server /vision/keypoints, e.g. http://central:5000")
+    parser.add_argument("--node", default=None, help="Edge node id sent upstream, defaults to the host name")
+    parser.add_argument("--interval", type=float, default=5.0, help="Stats report interval in seconds")
+    args = parser.parse_args()
+
+    sources = {}
+    for item in args.source:
+        id, sep, uri = item.partition("=")
+        if not sep:
+            parser.error(f"Invalid source '{item}', expected ID=URI.")
+        sources[id] = uri
+
+    runner = EdgeRunner(sources, workers=args.workers, fences_path=args.fences, risk_boost=args.risk_boost,
+                        incidents_path=args.incidents, record_path=args.record, upstream=args.upstream,
+                        node=args.node, debug=True)
+    runner.start().report(args.interval)
@@ -0,0 +1,104 @@
+import bisect
+import hashlib
+import threading
+
+
+def _hash(key):
+    # Stable across processes and runs (unlike hash())
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+
+class HashRing:
+    # Constructor
+    def __init__(self, nodes=(), vnodes=64):
+        """
+        Consistent hash ring assigning sources to nodes
+        ---
+        <br/>
+        Each node is placed `vnodes` times on the ring so sources spread evenly, and adding or
+        removing a node only moves the sources of that node (about 1/N of them).
+        <br/>
+        Args:
+            nodes (list, optional): Initial node ids (e.g. base urls). Defaults to ().
+            vnodes (int, optional): Virtual nodes per node. Defaults to 64.
+        """
+        self.vnodes = vnodes
+        self._lock = threading.Lock()
+        self._keys = []
+        self._owners = []
+        self._nodes = set()
+        for node in nodes:
+            self.add(node)
+
+
+    def add(self, node):
+        """
+        Place a node on the ring
+        ---
+        <br/>
+        Returns:
+            bool: False if the node was already there
+        """
+        with self._lock:
+            if node in self._nodes:
+                return False
+            self._nodes.add(node)
+            for index in range(self.vnodes):
+                key = _hash(f"{node}#{index}")
+                at = bisect.bisect(self._keys, key)
+                self._keys.insert(at, key)
+                self._owners.insert(at, node)
+            return True
+
+
+    def remove(self, node):
+        """
+        Take a node off the ring
+        ---
+        <br/>
+        Returns:
+            bool: False if the node was not there
+        """
+        with self._lock:
+            if node not in self._nodes:
+                return False
+            self._nodes.discard(node)
+            kept = [(key, owner) for key, owner in zip(self._keys, self._owners) if owner != node]
+            self._keys = [key for key, _ in kept]
+            self._owners = [owner for _, owner in kept]
+            return True
+
+
+    def owner(self, key):
+        """
+        Node owning a key (source id)
+        ---
+        <br/>
+        Returns:
+            str | None: Node id, None if the ring is empty
+        """
+        with self._lock:
+            if not self._keys:
+                return None
+            at = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+            return self._owners[at]
+
+
+    def nodes(self):
+        """
+        Nodes on the ring
+        """
+        with self._lock:
+            return sorted(self._nodes)
+
+
+    def assign(self, keys):
+        """
+        Owner of every key
+        ---
+        <br/>
+        Returns:
+            dict: { key: node }
+        """
+        return { key: self.owner(key) for key in keys }
@@ -0,0 +1,37 @@
+import json
+from pathlib import Path
+
+
+def load_fences(path="./data/fences.json"):
+    """
+    Load fences json file
+    ---
+    <br/>
+    Args:
+        path (str, optional): Fences file path. Defaults to "./data/fences.json".
+    Returns:
+        dict: Fences by name in format { name: { "name", "id": source id, "bbox": [x1,y1,x2,y2] } }
+    """
+    try:
+        with Path(path).open("r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def find_fence(fences, source):
+    """
+    Find the fence assigned to a source
+    ---
+    <br/>
+    Args:
+        fences (dict): Fences as returned by load_fences
+        source (str): Source id or fence name
+    Returns:
+        dict | None: Fence data
+    """
+    for name, fence in fences.items():
+        if fence.get("id") == source or name == source:
+            return fence
+    return None
+
@@ -0,0 +1,225 @@
+import json
+import time
+import heapq
+import bisect
+import itertools
+import threading
+from pathlib import Path
+
+
+# Index key holding every source
+_ALL = "*"
+
+
+class _Segment:
+    def __init__(self, path, id):
+        """
+        Segment file and its in memory index { source: ([ts...], [offset...]) }
+        """
+        self.path = path
+        self.id = id
+        self.index = {}
+        self.t_min = None
+        self.t_max = None
+        self.size = 0
+        self.created = time.time()
+
+
+    def add(self, source, ts, offset):
+        for key in (source, _ALL):
+            tss, offsets = self.index.setdefault(key, ([], []))
+            # Keep (ts, offset) order even for late events
+            pos = bisect.bisect_right(tss, ts)
+            tss.insert(pos, ts)
+            offsets.insert(pos, offset)
+        self.t_min = ts if self.t_min is None else min(self.t_min, ts)
+        self.t_max = ts if self.t_max is None else max(self.t_max, ts)
+
+
+
+class IncidentLog:
+    # Constructor
+    def __init__(self, path="./data/incidents", segment_bytes=4 * 1024 * 1024, segment_seconds=3600,
+                 max_segments=168, max_age=7 * 24 * 3600, cooldown=2.0):
+        """
+        Append only incident log split in jsonl segment files, indexed by source and time
+        ---
+        <br/>
+        Args:
+            path (str, optional): Segments folder. Defaults to "./data/incidents".
+            segment_bytes (int, optional): Rotate when the active segment reaches this size. Defaults to 4MB.
+            segment_seconds (int, optional): Rotate when the active segment is this old. Defaults to 1h.
+            max_segments (int, optional): Segments kept on disk, oldest are deleted. Defaults to 168.
+            max_age (int, optional): Seconds an incident is kept. Defaults to 7 days.
+            cooldown (float, optional): Same source and type incidents closer than this are coalesced. Defaults to 2s.
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.max_segments = max_segments
+        self.max_age = max_age
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._last = {}
+        self._segments = []
+        self._file = None
+        self._load()
+
+
+    def _load(self):
+        """
+        Rebuild the index from the segments on disk
+        """
+        for seg_path in sorted(self.path.glob("*.jsonl")):
+            try:
+                segment = _Segment(seg_path, int(seg_path.stem))
+            except ValueError:
+                continue
+            with seg_path.open("rb") as file:
+                offset = 0
+                for line in file:
+                    try:
+                        item = json.loads(line)
+                        segment.add(item["source"], item["ts"], offset)
+                    except (ValueError, KeyError):
+                        pass  # Torn or corrupted line
+                    offset += len(line)
+                segment.size = offset
+            segment.created = segment.t_min or segment.created
+            self._segments.append(segment)
+        self._retain()
+        if self._segments:
+            self._file = self._segments[-1].path.open("ab")
+        else:
+            self._rotate()
+
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        id = self._segments[-1].id + 1 if self._segments else 0
+        segment = _Segment(self.path / f"{id:08d}.jsonl", id)
+        self._segments.append(segment)
+        self._file = segment.path.open("ab")
+        self._retain()
+
+
+    def _retain(self):
+        """
+        Delete segments beyond count or age limits (never the active one)
+        """
+        oldest = time.time() - self.max_age
+        while len(self._segments) > 1 and (
+            len(self._segments) > self.max_segments or
+            (self._segments[0].t_max or self._segments[0].created) < oldest
+        ):
+            segment = self._segments.pop(0)
+            segment.path.unlink(missing_ok=True)
+
+
+    def append(self, source, type, data=None, ts=None):
+        """
+        Record an incident
+        ---
+        <br/>
+        Args:
+            source (str): Source id (camera / bed)
+            type (str): Incident type, e.g. "outside_fence", "wrist_above_elbow"
+            data (dict, optional): Extra details (fence name, keypoints ...). Defaults to None.
+            ts (float, optional): Epoch seconds. Defaults to now.
+        Returns:
+            dict | None: Stored incident, None if coalesced by the cooldown
+        """
+        ts = time.time() if ts is None else float(ts)
+        item = { "ts": ts, "source": source, "type": type, "data": data or {} }
+        with self._lock:
+            last = self._last.get((source, type))
+            if last is not None and abs(ts - last) < self.cooldown:
+                return None
+            self._last[(source, type)] = ts
+            segment = self._segments[-1]
+            if segment.size >= self.segment_bytes or time.time() - segment.created >= self.segment_seconds:
+                self._rotate()
+                segment = self._segments[-1]
+            line = (json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8")
+            self._file.write(line)
+            self._file.flush()
+            segment.add(source, ts, segment.size)
+            segment.size += len(line)
+        return item
+
+
+    def query(self, source=None, start=None, end=None, limit=100, cursor=None):
+        """
+        Incidents in a time range, newest first, answered from the index
+        ---
+        <br/>
+        Args:
+            source (str, optional): Source id. Defaults to None (all sources).
+            start (float, optional): From epoch seconds. Defaults to None (oldest kept).
+            end (float, optional): To epoch seconds. Defaults to None (now).
+            limit (int, optional): Page size. Defaults to 100.
+            cursor (str, optional): "next" value of the previous page. Defaults to None.
+        Returns:
+            tuple: (incidents list, next page cursor or None)
+        Raises:
+            ValueError: Malformed cursor
+        """
+        key = source or _ALL
+        start = float("-inf") if start is None else float(start)
+        end = float("inf") if end is None else float(end)
+        after = None
+        if cursor:
+            try:
+                cts, seg_id, coff = cursor.split(":")
+                after = (float(cts), int(seg_id), int(coff))
+            except ValueError:
+                raise ValueError("Invalid cursor.")
+
+        def newest_first(segment, tss, offsets, lo, hi):
+            for pos in range(hi - 1, lo - 1, -1):
+                hit = (tss[pos], segment.id, offsets[pos])
+                if after is None or hit < after:
+                    yield hit + (segment,)
+
+        # Late events land in the active segment, so segments overlap in time: merge their
+        # (ts, segment, offset) positions from the index, newest first
+        with self._lock:
+            runs = []
+            for segment in self._segments:
+                if segment.t_max is None or segment.t_max < start or segment.t_min > end:
+                    continue
+                if after and segment.t_min > after[0]:
+                    continue
+                tss, offsets = segment.index.get(key, ([], []))
+                lo = bisect.bisect_left(tss, start)
+                hi = bisect.bisect_right(tss, end if after is None else min(end, after[0]))
+                runs.append(newest_first(segment, tss, offsets, lo, hi))
+            hits = list(itertools.islice(heapq.merge(*runs, key=lambda hit: hit[:3], reverse=True), limit + 1))
+
+        more = len(hits) > limit
+        hits = hits[:limit]
+        # Read only the hit lines
+        items = []
+        files = {}
+        try:
+            for _, _, offset, segment in hits:
+                if segment.id not in files:
+                    files[segment.id] = segment.path.open("rb")
+                file = files[segment.id]
+                file.seek(offset)
+                try:
+                    items.append(json.loads(file.readline()))
+                except ValueError:
+                    pass
+        except FileNotFoundError:
+            pass  # Segment dropped by retention meanwhile
+        finally:
+            for file in files.values():
+                file.close()
+        next_cursor = None
+        if more and hits:
+            ts, seg_id, offset, _ = hits[-1]
+            next_cursor = f"{ts!r}:{seg_id}:{offset}"
+        return items, next_cursor
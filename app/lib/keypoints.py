@@ -0,0 +1,93 @@
+import math
+import time
+import base64
+import numpy as np
+from lib.landmarks import BODY_LANDMARKS
+
+
+# Compact landmark layout: (poses, 33, 4) little endian float32, normalized x, y, z, visibility
+LANDMARK_SHAPE = (len(BODY_LANDMARKS), 4)
+LANDMARK_DTYPE = np.dtype("<f4")
+
+
+def encode_frame(source, landmarks, ts=None, tracks=None):
+    """
+    Pack a frame landmarks for /vision/keypoints
+    ---
+    <br/>
+    Args:
+        source (str): Source id
+        landmarks (np.ndarray): (poses, 33, 4) as returned by MPipe.bodypose_detection(with_array=True)
+        ts (float, optional): Frame epoch seconds. Defaults to now.
+        tracks (list, optional): Track id per pose. Defaults to None (pose index).
+    Returns:
+        dict: { "source", "ts", "shape", "data": base64 float32, "tracks" }
+    """
+    landmarks = np.ascontiguousarray(landmarks, dtype=LANDMARK_DTYPE).reshape(-1, *LANDMARK_SHAPE)
+    frame = {
+        "source": source,
+        "ts": time.time() if ts is None else float(ts),
+        "shape": list(landmarks.shape),
+        "data": base64.b64encode(landmarks.tobytes()).decode("ascii"),
+    }
+    if tracks is not None:
+        frame["tracks"] = [int(track) for track in tracks]
+    return frame
+
+
+def decode_frame(frame):
+    """
+    Unpack a /vision/keypoints frame
+    ---
+    <br/>
+    Args:
+        frame (dict): Frame as built by encode_frame
+    Returns:
+        tuple: (source, landmarks (poses, 33, 4) float32, ts or None, tracks or None)
+    Raises:
+        ValueError: Malformed frame
+    """
+    if not isinstance(frame, dict):
+        raise ValueError("Frame must be an object.")
+    source = frame.get("source")
+    if not source or not isinstance(source, str):
+        raise ValueError("Required frame param 'source' not found.")
+    try:
+        raw = base64.b64decode(frame.get("data") or "", validate=True)
+    except (TypeError, ValueError):
+        raise ValueError(f"Frame of '{source}': 'data' is not valid base64.")
+    row_bytes = LANDMARK_DTYPE.itemsize * LANDMARK_SHAPE[0] * LANDMARK_SHAPE[1]
+    if len(raw) % row_bytes:
+        raise ValueError(f"Frame of '{source}': 'data' is not a (poses, {LANDMARK_SHAPE[0]}, {LANDMARK_SHAPE[1]}) float32 array.")
+    landmarks = np.frombuffer(raw, dtype=LANDMARK_DTYPE).reshape(-1, *LANDMARK_SHAPE)
+    shape = frame.get("shape")
+    if shape is not None and (not isinstance(shape, list) or shape != list(landmarks.shape)):
+        raise ValueError(f"Frame of '{source}': shape {shape} doesn't match data {list(landmarks.shape)}.")
+    ts = frame.get("ts")
+    if ts is not None and (isinstance(ts, bool) or not isinstance(ts, (int, float)) or not math.isfinite(ts)):
+        raise ValueError(f"Frame of '{source}': 'ts' must be epoch seconds.")
+    tracks = frame.get("tracks")
+    if tracks is not None:
+        if not isinstance(tracks, list) or not all(
+            isinstance(track, int) and not isinstance(track, bool) and -2**31 <= track < 2**31 for track in tracks
+        ):
+            raise ValueError(f"Frame of '{source}': 'tracks' must be a list of integers.")
+        if len(tracks) != len(landmarks):
+            raise ValueError(f"Frame of '{source}': expected {len(landmarks)} tracks.")
+    return source, landmarks, None if ts is None else float(ts), tracks
+
+
+def array_to_detections(landmarks):
+    """
+    Expand compact landmarks into the detections format of MPipe.bodypose_detection (normalized)
+    """
+    return [
+        {
+            "segmentation_mask": None,
+            "keypoints": [
+                { "name": name, "x": float(x), "y": float(y), "z": float(z), "visibility": float(vis) }
+                for name, (x, y, z, vis) in zip(BODY_LANDMARKS, pose)
+            ],
+        }
+        for pose in landmarks
+    ]
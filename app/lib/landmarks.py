@@ -0,0 +1,36 @@
+# Mediapipe pose landmarker output order (33 landmarks)
+BODY_LANDMARKS = [
+    "nose",
+    "leftEyeInner",
+    "leftEye",
+    "leftEyeOuter",
+    "rightEyeInner",
+    "rightEye",
+    "rightEyeOuter",
+    "leftEar",
+    "rightEar",
+    "mouthLeft",
+    "mouthRight",
+    "leftShoulder",
+    "rightShoulder",
+    "leftElbow",
+    "rightElbow",
+    "leftWrist",
+    "rightWrist",
+    "leftPinky",
+    "rightPinky",
+    "leftIndex",
+    "rightIndex",
+    "leftThumb",
+    "rightThumb",
+    "leftHip",
+    "rightHip",
+    "leftKnee",
+    "rightKnee",
+    "leftAnkle",
+    "rightAnkle",
+    "leftHeel",
+    "rightHeel",
+    "leftFootIndex",
+    "rightFootIndex"
+]
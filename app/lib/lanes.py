@@ -0,0 +1,148 @@
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError
+
+
+class LaneFull(Exception):
+    """
+    Raised when a lane queue is at its max depth
+    """
+
+
+
+class LaneTimeout(LaneFull):
+    """
+    Raised when a job waited longer than its caller, the job is cancelled (handled as a busy lane)
+    """
+
+
+
+class Lane:
+    # Constructor
+    def __init__(self, name, factory, workers=1, max_pending=16):
+        """
+        Execution lane: dedicated workers, each owning its own engine, fed by a priority queue
+        ---
+        <br/>
+        Args:
+            name (str): Lane name for stats
+            factory (callable): Creates the engine of a worker (e.g. an MPipe instance)
+            workers (int, optional): Worker threads (and engines). Defaults to 1.
+            max_pending (int, optional): Queued jobs before rejecting with LaneFull. Defaults to 16.
+        """
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._busy = 0
+        self._served = 0
+        self._rejected = 0
+        self._expired = 0
+        self._waits = deque(maxlen=256)
+        # Engines are created up front so the first requests don't pay model loading
+        engines = [factory() for _ in range(workers)]
+        for engine in engines:
+            threading.Thread(target=self._work, args=(engine,), daemon=True).start()
+
+
+    def submit(self, fn, priority=1):
+        """
+        Queue a job, lower priority values are served first
+        ---
+        <br/>
+        Args:
+            fn (callable): fn(engine) -> result, run on one of the lane workers
+            priority (int, optional): 0 for urgent (sources at risk), 1 for normal. Defaults to 1.
+        Returns:
+            Future: Resolves to (result, queue wait in ms), or fails with LaneFull if evicted by a more urgent job
+        Raises:
+            LaneFull: Queue full of jobs at least as urgent
+        """
+        future = Future()
+        evicted = None
+        with self._cond:
+            if len(self._queue) >= self.max_pending:
+                # Jobs whose callers gave up don't hold a slot
+                self._queue = [job for job in self._queue if not job[4].cancelled()]
+                heapq.heapify(self._queue)
+            if len(self._queue) >= self.max_pending:
+                # Lowest ranked job: worst priority, most recently queued
+                worst = max(self._queue, key=lambda job: job[:2])
+                self._rejected += 1
+                if priority >= worst[0]:
+                    raise LaneFull(f"{self.name} lane is full.")
+                # Urgent jobs (sources at risk) take the slot of a normal one
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                evicted = worst[4]
+            heapq.heappush(self._queue, (priority, next(self._seq), time.time(), fn, future))
+            self._cond.notify()
+        if evicted is not None and evicted.set_running_or_notify_cancel():
+            evicted.set_exception(LaneFull(f"{self.name} lane is full."))
+        return future
+
+
+    def run(self, fn, priority=1, timeout=30):
+        """
+        Submit a job and wait for it
+        ---
+        <br/>
+        Returns:
+            tuple: (result, queue wait in ms)
+        Raises:
+            LaneFull: Queue at its max depth
+            LaneTimeout: No result in `timeout` seconds, the job is dropped if it didn't start
+        """
+        future = self.submit(fn, priority)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            # Don't run it later against a request that is already answered
+            future.cancel()
+            with self._cond:
+                self._expired += 1
+            raise LaneTimeout(f"{self.name} lane timed out.")
+
+
+    def _work(self, engine):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                _, _, queued, fn, future = heapq.heappop(self._queue)
+                wait_ms = (time.time() - queued) * 1000
+                self._waits.append(wait_ms)
+                self._busy += 1
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result((fn(engine), round(wait_ms, 1)))
+                except Exception as err:
+                    future.set_exception(err)
+            with self._cond:
+                self._busy -= 1
+                self._served += 1
+
+
+    def stats(self):
+        """
+        Queue depth, busy workers and recent wait times (ms)
+        """
+        with self._cond:
+            waits = sorted(self._waits)
+            pick = lambda p: round(waits[min(len(waits) - 1, int(p * len(waits)))], 1) if waits else None
+            return {
+                "workers": self.workers,
+                "busy": self._busy,
+                "depth": len(self._queue),
+                "max_pending": self.max_pending,
+                "served": self._served,
+                "rejected": self._rejected,
+                "expired": self._expired,
+                "wait_p50": pick(0.5),
+                "wait_p95": pick(0.95),
+            }
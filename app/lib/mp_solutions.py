@@ -6,14 +6,27 @@ import mediapipe as mp
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 from mediapipe.tasks.python.components import containers
+from lib.landmarks import BODY_LANDMARKS
 import torch
 
 # # Audio data for sound classifications
 # AudioData = mp.tasks.components.containers.AudioData
 
 class MPipe:
+    # Optional lighter pose model for degraded quality levels
+    LITE_MODEL = './models/pose_landmarker_lite.task'
+
+
+    @classmethod
+    def has_lite(cls):
+        """
+        Check if instances load the lite pose model
+        """
+        return os.path.exists(cls.LITE_MODEL)
+
+
     # Constructor
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, bodypose=True, segmenter=True):
         """
         Create a mediapipe solutions instance
         ---
@@ -22,25 +35,39 @@ class MPipe:
             detection_treshold (float, optional): Treshold where detection confidence is taken. Defaults to 0.5.
             debug (bool, optional): Run in debug mode to show step by step execution in console. Defaults to False.
             gpu (bool, optional): Load models into gpu. Defaults to False.
+            bodypose (bool, optional): Load the body pose model. Defaults to True.
+            segmenter (bool, optional): Load the MagicTouch model. Defaults to True.
         """
         try:
             gpu_available = torch.cuda.is_available()
             delegate = delegate=python.BaseOptions.Delegate.GPU if gpu_available else python.BaseOptions.Delegate.CPU
             self.debug = debug
-            if debug:
-                print("Loading Bodypose model...")
-            bpmodel_path = python.BaseOptions(model_asset_path='./models/pose_landmarker.task', delegate=delegate)
-            bpoptions = vision.PoseLandmarkerOptions(base_options=bpmodel_path, num_poses=10, output_segmentation_masks=True)
-            self.bodypose_detector = vision.PoseLandmarker.create_from_options(bpoptions)
-            if debug:
-                print("Cargando modelo MagicTouch (Interactive Segmenter)...")
-            imodel = python.BaseOptions(model_asset_path='./models/magic_touch.tflite', delegate=delegate)
-            ioptions = vision.InteractiveSegmenterOptions(
-                base_options=imodel,
-                output_category_mask=True,
-                output_confidence_masks=True
-            )
-            self.interactive_segmenter = vision.InteractiveSegmenter.create_from_options(ioptions)
+            self.bodypose_detector = None
+            self.bodypose_lite = None
+            self.interactive_segmenter = None
+            if bodypose:
+                if debug:
+                    print("Loading Bodypose model...")
+                bpmodel_path = python.BaseOptions(model_asset_path='./models/pose_landmarker.task', delegate=delegate)
+                bpoptions = vision.PoseLandmarkerOptions(base_options=bpmodel_path, num_poses=10, output_segmentation_masks=True)
+                self.bodypose_detector = vision.PoseLandmarker.create_from_options(bpoptions)
+                # Lighter model for degraded quality levels (optional)
+                if self.has_lite():
+                    if debug:
+                        print("Loading Bodypose lite model...")
+                    lmodel_path = python.BaseOptions(model_asset_path=self.LITE_MODEL, delegate=delegate)
+                    loptions = vision.PoseLandmarkerOptions(base_options=lmodel_path, num_poses=10, output_segmentation_masks=False)
+                    self.bodypose_lite = vision.PoseLandmarker.create_from_options(loptions)
+            if segmenter:
+                if debug:
+                    print("Cargando modelo MagicTouch (Interactive Segmenter)...")
+                imodel = python.BaseOptions(model_asset_path='./models/magic_touch.tflite', delegate=delegate)
+                ioptions = vision.InteractiveSegmenterOptions(
+                    base_options=imodel,
+                    output_category_mask=True,
+                    output_confidence_masks=True
+                )
+                self.interactive_segmenter = vision.InteractiveSegmenter.create_from_options(ioptions)
             if debug:
                 print("Start engine finished...")
         except Exception as err:
@@ -50,26 +77,35 @@ class MPipe:
     
     
     # DECODE BLOB IMAGE
-    def _decode_image(self, blob_image):
+    def _decode_image(self, blob_image, scale=1.0):
         """
         Decode a blob image into mediapipe image object
         ---
         <br/>
         Args:
-            blob_image (str): Image binary to convert into Mediapipe image object
+            blob_image (str | np.ndarray): Image binary, or a raw BGR frame, to convert into Mediapipe image object
+            scale (float, optional): Resize factor applied before inference. Defaults to 1.0.
         Returns:
             Mediapipe Image: Mediapipe image object
         """
         try:
-            # Read as buffer
-            buffer = blob_image.read()
-            # Convert bytes into numpy array
-            np_arr = np.frombuffer(buffer, np.uint8)
-            # Decode the numpy array into an OpenCV image (BGR)
-            image = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+            if isinstance(blob_image, np.ndarray):
+                # Raw frame (shared memory transport), skip the jpeg decode
+                image = blob_image
+            else:
+                # Read as buffer
+                buffer = blob_image.read()
+                # Convert bytes into numpy array
+                np_arr = np.frombuffer(buffer, np.uint8)
+                # Decode the numpy array into an OpenCV image (BGR)
+                image = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
             if image is None:
                 raise ValueError("Failed to decode image.")
 
+            # Reduce input resolution
+            if scale < 1.0:
+                image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
             # Convert BGR to RGB
             image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
 
@@ -109,73 +145,46 @@ class MPipe:
             raise ValueError(f"MP: Error encoding image: {err}")
 
     # BODY LANDMARKS NAMES
-    _body_landmarks = [
-        "nose",
-        "leftEyeInner",
-        "leftEye",
-        "leftEyeOuter",
-        "rightEyeInner",
-        "rightEye",
-        "rightEyeOuter",
-        "leftEar",
-        "rightEar",
-        "mouthLeft",
-        "mouthRight",
-        "leftShoulder",
-        "rightShoulder",
-        "leftElbow",
-        "rightElbow",
-        "leftWrist",
-        "rightWrist",
-        "leftPinky",
-        "rightPinky",
-        "leftIndex",
-        "rightIndex",
-        "leftThumb",
-        "rightThumb",
-        "leftHip",
-        "rightHip",
-        "leftKnee",
-        "rightKnee",
-        "leftAnkle",
-        "rightAnkle",
-        "leftHeel",
-        "rightHeel",
-        "leftFootIndex",
-        "rightFootIndex"
-    ]
+    _body_landmarks = BODY_LANDMARKS
 
     
     # BODY POSE DETECTION
-    def bodypose_detection(self, image, normalized=True):
+    def bodypose_detection(self, image, normalized=True, with_array=False, masks=True, scale=1.0, lite=False):
         """
         Body pose detection
         ---
         <br/>
         Args:
-            image (blob): Blob image
+            image (blob | np.ndarray): Blob image or raw BGR frame
             normalized (bool, optional): Results with normalized 3d coordinates . Default true.
+            with_array (bool, optional): Also return landmarks as a (poses, 33, 4) float32 array of normalized x, y, z, visibility. Default false.
+            masks (bool, optional): Encode segmentation masks. Default true.
+            scale (float, optional): Input resolution factor, coordinates keep the original frame size. Default 1.0.
+            lite (bool, optional): Use the lite model when available (no masks). Default false.
         Returns:
             list: Each detected body object with segmentation mask and keypoints
                 - segmentation_mask: Body segmentation mask
                 - keypoints: Each landmark detected with "name", "x/y/z" position
                 - world_keypoints: Each landmark detected with "name", "x/y/z" position
+            np.ndarray: Landmarks array, only if with_array
         """
         try:
             # Decode blob image
-            decoded_img = self._decode_image(image)
-            # Image width and height
-            iw = decoded_img.width
-            ih = decoded_img.height
+            decoded_img = self._decode_image(image, scale)
+            # Original image width and height
+            iw = decoded_img.width / scale
+            ih = decoded_img.height / scale
             
             # Request hand pose detection
-            bodypose_results = self.bodypose_detector.detect(decoded_img)
+            detector = self.bodypose_lite if lite and self.bodypose_lite is not None else self.bodypose_detector
+            bodypose_results = detector.detect(decoded_img)
+            masks = masks and bool(bodypose_results.segmentation_masks)
             
             # Map detection results
             results = [
                 {
                     # Convert segmentation mask into base64 image
-                    "segmentation_mask": self._encode64(bodypose_results.segmentation_masks[index].numpy_view()),
+                    "segmentation_mask": self._encode64(bodypose_results.segmentation_masks[index].numpy_view()) if masks else None,
                     # Landmark name and coordinates in 3d relative space (normalized by default)
                     "keypoints": [
                         {
@@ -203,10 +212,29 @@ class MPipe:
             ]
             
             # Return results
+            if with_array:
+                return results, self._landmarks_array(bodypose_results.pose_landmarks)
             return results
             
         except Exception as err:
             raise ValueError(f"MP: Bodypose detection error: {err}")
+
+
+    # LANDMARKS ARRAY
+    def _landmarks_array(self, poses):
+        """
+        Pack pose landmarks into the compact array layout
+        ---
+        <br/>
+        Args:
+            poses (list): Mediapipe pose_landmarks
+        Returns:
+            np.ndarray: (poses, 33, 4) float32 normalized x, y, z, visibility
+        """
+        return np.array(
+            [[(lm.x, lm.y, lm.z, lm.visibility or 0.0) for lm in pose] for pose in poses],
+            dtype=np.float32
+        ).reshape(-1, len(self._body_landmarks), 4)
         
     def interactive_segmentation(self, image, touch_x: float, touch_y: float, normalized: bool = True):
         """
@@ -0,0 +1,248 @@
+import re
+import time
+import hashlib
+import threading
+import numpy as np
+from pathlib import Path
+from lib.landmarks import BODY_LANDMARKS
+
+
+# Fixed stride columns: one row per detected pose
+_COLUMNS = {
+    "ts": (np.float64, ()),
+    "frame": (np.int64, ()),
+    "track": (np.int32, ()),
+    "landmarks": (np.float32, (len(BODY_LANDMARKS), 4)),
+}
+
+
+def _source_dir(path, source):
+    # Source ids are device ids / names, keep them filesystem safe, the hash keeps "bed/7" and "bed:7" apart
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:8]
+    return Path(path) / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', source)}-{digest}"
+
+
+def _map(file, dtype, shape, rows, mode):
+    return np.memmap(file, dtype=dtype, mode=mode, shape=(rows, *shape))
+
+
+
+class _SourceColumns:
+    def __init__(self, folder, chunk, source):
+        """
+        Memory mapped column files of a single source, grown by chunks
+        """
+        self.folder = folder
+        self.folder.mkdir(parents=True, exist_ok=True)
+        # Original source id, folder names are sanitized
+        (folder / "source.txt").write_text(source, encoding="utf-8")
+        self.chunk = chunk
+        self.lock = threading.Lock()
+        # Committed rows counter, readers never look past it
+        count_file = folder / "count.i64"
+        if not count_file.exists():
+            np.zeros(1, np.int64).tofile(count_file)
+        self.count = np.memmap(count_file, dtype=np.int64, mode="r+", shape=(1,))
+        self.capacity = 0
+        self.columns = {}
+        self._grow(max(int(self.count[0]), 1))
+        last = int(self.count[0]) - 1
+        self.last_ts = float(self.columns["ts"][last]) if last >= 0 else 0.0
+        self.next_frame = int(self.columns["frame"][last]) + 1 if last >= 0 else 0
+        # Frames older than the last recorded one, dropped
+        self.late = 0
+
+
+    def _grow(self, rows):
+        capacity = max(self.chunk, self.capacity)
+        while capacity < rows:
+            capacity *= 2
+        for name, (dtype, shape) in _COLUMNS.items():
+            file = self.folder / f"{name}.bin"
+            row_bytes = np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64))
+            with open(file, "ab") as f:
+                if f.tell() < capacity * row_bytes:
+                    f.truncate(capacity * row_bytes)
+            old = self.columns.get(name)
+            if old is not None:
+                old.flush()
+            self.columns[name] = _map(file, dtype, shape, capacity, "r+")
+        self.capacity = capacity
+
+
+    def append(self, ts, landmarks, tracks):
+        with self.lock:
+            # Time index relies on non decreasing timestamps, late frames are not rewritten in time
+            if ts < self.last_ts:
+                self.late += 1
+                return False
+            n = int(self.count[0])
+            rows = len(landmarks)
+            if n + rows > self.capacity:
+                self._grow(n + rows)
+            self.columns["ts"][n:n + rows] = ts
+            self.columns["frame"][n:n + rows] = self.next_frame
+            self.columns["track"][n:n + rows] = tracks
+            self.columns["landmarks"][n:n + rows] = landmarks
+            # Publish rows only after they are written
+            self.count[0] = n + rows
+            self.last_ts = ts
+            self.next_frame += 1
+            return True
+
+
+    def flush(self):
+        with self.lock:
+            for column in self.columns.values():
+                column.flush()
+            self.count.flush()
+
+
+
+class PoseRecorder:
+    # Constructor
+    def __init__(self, path="./data/poses", chunk=65536):
+        """
+        Append only per source pose recorder on memory mapped column files
+        ---
+        <br/>
+        Each source folder holds ts.bin (float64), frame.bin (int64 frame sequence), track.bin (int32)
+        and landmarks.bin (33x4 float32: normalized x, y, z, visibility), one row per pose, plus the
+        committed row count. Appending is a memory copy, no serialization on the hot path. Frames
+        older than the last recorded one of the source are dropped (counted in `late()`).
+        <br/>
+        Args:
+            path (str, optional): Recordings folder. Defaults to "./data/poses".
+            chunk (int, optional): Rows preallocated per growth step. Defaults to 65536.
+        """
+        self.path = Path(path)
+        self.chunk = chunk
+        self._lock = threading.Lock()
+        self._sources = {}
+
+
+    def _columns(self, source):
+        columns = self._sources.get(source)
+        if columns is None:
+            with self._lock:
+                columns = self._sources.get(source)
+                if columns is None:
+                    columns = _SourceColumns(_source_dir(self.path, source), self.chunk, source)
+                    self._sources[source] = columns
+        return columns
+
+
+    def append(self, source, landmarks, ts=None, tracks=None):
+        """
+        Record a frame poses
+        ---
+        <br/>
+        Args:
+            source (str): Source id
+            landmarks (np.ndarray): (poses, 33, 4) float32 as returned by MPipe.bodypose_detection(with_array=True)
+            ts (float, optional): Epoch seconds. Defaults to now.
+            tracks (list, optional): Track id per pose. Defaults to the pose index.
+        Returns:
+            bool: False if nothing was recorded (no poses or late frame)
+        """
+        if landmarks is None or len(landmarks) == 0:
+            return False
+        ts = time.time() if ts is None else float(ts)
+        tracks = np.arange(len(landmarks), dtype=np.int32) if tracks is None else np.asarray(tracks, dtype=np.int32)
+        return self._columns(source).append(ts, landmarks, tracks)
+
+
+    def late(self):
+        """
+        Late frames dropped per source
+        """
+        return { source: columns.late for source, columns in list(self._sources.items()) }
+
+
+    def flush(self):
+        """
+        Write mapped pages to disk
+        """
+        for columns in list(self._sources.values()):
+            columns.flush()
+
+
+
+class PoseReader:
+    # Constructor
+    def __init__(self, path="./data/poses"):
+        """
+        Read only access to PoseRecorder files
+        ---
+        <br/>
+        Args:
+            path (str, optional): Recordings folder. Defaults to "./data/poses".
+        """
+        self.path = Path(path)
+
+
+    def sources(self):
+        """
+        Recorded source ids
+        """
+        if not self.path.exists():
+            return []
+        return sorted(
+            (p / "source.txt").read_text(encoding="utf-8")
+            for p in self.path.iterdir() if (p / "count.i64").exists() and (p / "source.txt").exists()
+        )
+
+
+    def range(self, source, start=None, end=None):
+        """
+        Rows of a source in a time range, as NumPy views over the mapped files (no copies, no parsing)
+        ---
+        <br/>
+        Args:
+            source (str): Source id
+            start (float, optional): From epoch seconds. Defaults to None (first row).
+            end (float, optional): To epoch seconds. Defaults to None (last row).
+        Returns:
+            dict: "ts" (N,), "frame" (N,), "track" (N,) and "landmarks" (N, 33, 4) views
+        """
+        folder = _source_dir(self.path, source)
+        count = int(np.fromfile(folder / "count.i64", dtype=np.int64)[0])
+        columns = {
+            name: _map(folder / f"{name}.bin", dtype, shape, count, "r") if count else np.empty((0, *shape), dtype)
+            for name, (dtype, shape) in _COLUMNS.items()
+        }
+        ts = columns["ts"]
+        # Timestamps are sorted, binary search is the time index
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+        hi = count if end is None else int(np.searchsorted(ts, end, side="right"))
+        return { name: column[lo:hi] for name, column in columns.items() }
+
+
+    def replay(self, source, start=None, end=None, speed=None):
+        """
+        Yield recorded frames in order, optionally paced
+        ---
+        <br/>
+        Args:
+            source (str): Source id
+            start (float, optional): From epoch seconds. Defaults to None.
+            end (float, optional): To epoch seconds. Defaults to None.
+            speed (float, optional): Times real time, e.g. 60. Defaults to None (as fast as possible).
+        Yields:
+            tuple: (ts, tracks view, landmarks view) per recorded frame
+        """
+        rows = self.range(source, start, end)
+        ts = rows["ts"]
+        if len(ts) == 0:
+            return
+        # Frame boundaries from the recorded frame sequence, frames may share a timestamp
+        bounds = np.flatnonzero(np.diff(rows["frame"])) + 1
+        starts = np.concatenate(([0], bounds))
+        stops = np.concatenate((bounds, [len(ts)]))
+        t0 = float(ts[0])
+        wall0 = time.time()
+        for lo, hi in zip(starts, stops):
+            frame_ts = float(ts[lo])
+            if speed:
+                time.sleep(max(0.0, wall0 + (frame_ts - t0) / speed - time.time()))
+            yield frame_ts, rows["track"][lo:hi], rows["landmarks"][lo:hi]
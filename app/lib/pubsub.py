@@ -0,0 +1,197 @@
+import time
+import threading
+from collections import deque
+
+
+class Subscription:
+    # Constructor
+    def __init__(self, hub, source, maxlen=4, thumbnails=False):
+        """
+        Bounded per subscriber buffer, the oldest results are dropped for slow clients
+        ---
+        <br/>
+        Args:
+            hub (ResultHub): Owner hub
+            source (str): Subscribed source id
+            maxlen (int, optional): Buffered results. Defaults to 4.
+            thumbnails (bool, optional): Receive annotated thumbnails. Defaults to False.
+        """
+        self.hub = hub
+        self.source = source
+        self.thumbnails = thumbnails
+        self.buffer = deque(maxlen=maxlen)
+        self.dropped = 0
+        self._cond = threading.Condition()
+
+
+    def put(self, item):
+        with self._cond:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(item)
+            self._cond.notify()
+
+
+    def get(self, timeout=None):
+        """
+        Next result or None on timeout
+        """
+        with self._cond:
+            if not self.buffer:
+                self._cond.wait(timeout)
+            return self.buffer.popleft() if self.buffer else None
+
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+
+class ResultHub:
+    # Constructor
+    def __init__(self, lease=3.0):
+        """
+        Per source result fan out: one producer infers, every viewer subscribes
+        ---
+        <br/>
+        Args:
+            lease (float, optional): Seconds a producer keeps a source without uploading. Defaults to 3.0.
+        """
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._producers = {}
+        self._latest = {}
+        self._subscribers = {}
+
+
+    def claim(self, source, client):
+        """
+        Claim (or renew) the producer role of a source
+        ---
+        <br/>
+        Args:
+            source (str): Source id
+            client (str): Client id
+        Returns:
+            bool: True if the client is the source producer
+        """
+        now = time.time()
+        with self._lock:
+            owner = self._producers.get(source)
+            if owner is None or owner[0] == client or owner[1] < now:
+                self._producers[source] = (client, now + self.lease)
+                return True
+            return False
+
+
+    def publish(self, source, result, thumbnail=None):
+        """
+        Store the latest result of a source and push it to its subscribers
+        ---
+        <br/>
+        Args:
+            source (str): Source id
+            result (dict): Inference result
+            thumbnail (str, optional): Annotated base64 thumbnail. Defaults to None.
+        """
+        item = { "source": source, "ts": time.time(), **result }
+        with self._lock:
+            self._latest[source] = item
+            subscribers = list(self._subscribers.get(source, ()))
+        for sub in subscribers:
+            sub.put({ **item, "thumbnail": thumbnail } if sub.thumbnails and thumbnail else item)
+
+
+    def latest(self, source):
+        """
+        Latest published result of a source or None
+        """
+        with self._lock:
+            return self._latest.get(source)
+
+
+    def has_subscribers(self, source):
+        """
+        Check if a source has any subscriber
+        """
+        with self._lock:
+            return bool(self._subscribers.get(source))
+
+
+    def wants_thumbnails(self, source):
+        """
+        Check if any subscriber of the source asked for thumbnails
+        """
+        with self._lock:
+            return any(sub.thumbnails for sub in self._subscribers.get(source, ()))
+
+
+    def subscribe(self, source, maxlen=4, thumbnails=False):
+        """
+        Subscribe to a source results
+        ---
+        <br/>
+        Returns:
+            Subscription: Call get() to receive results, close() when done
+        """
+        sub = Subscription(self, source, maxlen, thumbnails)
+        with self._lock:
+            self._subscribers.setdefault(source, set()).add(sub)
+        return sub
+
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.source)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.source]
+
+
+    def stats(self):
+        """
+        Producer and subscribers per source
+        """
+        now = time.time()
+        with self._lock:
+            sources = set(self._producers) | set(self._subscribers)
+            return {
+                source: {
+                    "producer": self._producers[source][0] if source in self._producers and self._producers[source][1] >= now else None,
+                    "subscribers": len(self._subscribers.get(source, ())),
+                    "dropped": sum(sub.dropped for sub in self._subscribers.get(source, ())),
+                }
+                for source in sources
+            }
+
+
+def annotate_thumbnail(image_bytes, detections, width=160):
+    """
+    Downscaled jpeg with the detected keypoints drawn
+    ---
+    <br/>
+    Args:
+        image_bytes (bytes): Uploaded jpeg frame
+        detections (list): Normalized detections
+        width (int, optional): Thumbnail width. Defaults to 160.
+    Returns:
+        str | None: Base64 jpeg data url
+    """
+    # Only needed when a viewer asks for thumbnails
+    import cv2
+    import base64
+    import numpy as np
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    height = round(image.shape[0] * width / image.shape[1])
+    thumb = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    for det in detections:
+        for kp in det["keypoints"]:
+            if kp["x"] < 1 and kp["y"] < 1:
+                cv2.circle(thumb, (round(kp["x"] * width), round(kp["y"] * height)), 2, (0, 255, 0), -1)
+    ok, encoded = cv2.imencode(".jpg", thumb)
+    if not ok:
+        return None
+    return "data:image/jpeg;base64," + base64.b64encode(encoded.tobytes()).decode("utf-8")
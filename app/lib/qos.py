@@ -0,0 +1,139 @@
+import time
+import threading
+
+
+# Quality levels, from full quality down to the cheapest timely result
+LEVELS = [
+    { "name": "full", "masks": True, "scale": 1.0, "lite": False, "min_interval": 0.0 },
+    { "name": "no_masks", "masks": False, "scale": 1.0, "lite": False, "min_interval": 0.0 },
+    { "name": "half_resolution", "masks": False, "scale": 0.5, "lite": False, "min_interval": 0.0 },
+    { "name": "lite_model", "masks": False, "scale": 0.5, "lite": True, "min_interval": 0.0 },
+    { "name": "low_fps", "masks": False, "scale": 0.5, "lite": True, "min_interval": 0.5 },
+]
+
+
+def without_lite(levels=LEVELS):
+    """
+    Quality levels for engines without the lite model
+    ---
+    <br/>
+    The "lite_model" level would run the same as the one before it, so it is skipped and the
+    levels after it keep the full model.
+    """
+    return [{ **level, "lite": False } for level in levels if level["name"] != "lite_model"]
+
+
+class QoSController:
+    # Constructor
+    def __init__(self, budget_ms=200, levels=LEVELS, alpha=0.3, down_after=3, up_after=20):
+        """
+        Per source latency budget controller stepping quality down/up
+        ---
+        <br/>
+        Latency is smoothed (EWMA). Above 90% of the budget for `down_after` frames the source
+        drops one level; below 50% for `up_after` frames it climbs one level back.
+        <br/>
+        Args:
+            budget_ms (float, optional): Per frame latency budget (queue + inference). Defaults to 200.
+            levels (list, optional): Quality levels, best first. Defaults to LEVELS.
+            alpha (float, optional): EWMA smoothing factor. Defaults to 0.3.
+            down_after (int, optional): Consecutive slow frames before degrading. Defaults to 3.
+            up_after (int, optional): Consecutive fast frames before upgrading. Defaults to 20.
+        """
+        self.budget_ms = budget_ms
+        self.levels = levels
+        self.alpha = alpha
+        self.down_after = down_after
+        self.up_after = up_after
+        self._lock = threading.Lock()
+        self._sources = {}
+
+
+    def _state(self, source):
+        state = self._sources.get(source)
+        if state is None:
+            state = { "level": 0, "ewma": None, "slow": 0, "fast": 0, "last": 0.0, "skipped": 0 }
+            self._sources[source] = state
+        return state
+
+
+    def params(self, source):
+        """
+        Current quality parameters of a source
+        ---
+        <br/>
+        Returns:
+            dict: Level entry ("name", "masks", "scale", "lite", "min_interval") plus "level" index
+        """
+        with self._lock:
+            level = self._state(source)["level"]
+        return { "level": level, **self.levels[level] }
+
+
+    def skip(self, source, at_risk=False):
+        """
+        Check if a frame of a stable source should be skipped at low fps levels
+        ---
+        <br/>
+        Args:
+            source (str): Source id
+            at_risk (bool, optional): Sources at risk are never throttled. Defaults to False.
+        Returns:
+            bool: True to answer without inference
+        """
+        with self._lock:
+            state = self._state(source)
+            interval = self.levels[state["level"]]["min_interval"]
+            if at_risk or not interval or time.time() - state["last"] >= interval:
+                state["last"] = time.time()
+                return False
+            state["skipped"] += 1
+            return True
+
+
+    def observe(self, source, latency_ms):
+        """
+        Feed a measured frame latency, adjusts the source level
+        ---
+        <br/>
+        Returns:
+            int: Level for the next frame
+        """
+        with self._lock:
+            state = self._state(source)
+            state["ewma"] = latency_ms if state["ewma"] is None else self.alpha * latency_ms + (1 - self.alpha) * state["ewma"]
+            if state["ewma"] > self.budget_ms * 0.9:
+                state["slow"] += 1
+                state["fast"] = 0
+            elif state["ewma"] < self.budget_ms * 0.5:
+                state["fast"] += 1
+                state["slow"] = 0
+            else:
+                state["slow"] = state["fast"] = 0
+
+            if state["slow"] >= self.down_after and state["level"] < len(self.levels) - 1:
+                state["level"] += 1
+                state["slow"] = 0
+                # Give the new level a fresh estimate
+                state["ewma"] = None
+            elif state["fast"] >= self.up_after and state["level"] > 0:
+                state["level"] -= 1
+                state["fast"] = 0
+            return state["level"]
+
+
+    def status(self):
+        """
+        Level and smoothed latency per source
+        """
+        with self._lock:
+            return {
+                source: {
+                    "level": state["level"],
+                    "name": self.levels[state["level"]]["name"],
+                    "latency_ms": None if state["ewma"] is None else round(state["ewma"], 1),
+                    "budget_ms": self.budget_ms,
+                    "skipped": state["skipped"],
+                }
+                for source, state in self._sources.items()
+            }
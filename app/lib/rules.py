@@ -0,0 +1,260 @@
+import threading
+import numpy as np
+from lib.landmarks import BODY_LANDMARKS
+
+
+# Landmark index table
+LANDMARK_INDEX = { name: index for index, name in enumerate(BODY_LANDMARKS) }
+
+# Rules used when a fence doesn't define its own (same checks as cam.py / main.js)
+DEFAULT_RULES = [
+    { "name": "outside_fence", "type": "outside", "landmarks": "*", "match": "any", "frames": 1 },
+    { "name": "wrist_above_elbow", "type": "above", "a": ["leftWrist", "rightWrist"], "b": ["leftElbow", "rightElbow"], "match": "any", "frames": 1 },
+]
+
+
+def detections_to_array(detections):
+    """
+    Pack normalized detections (keypoint dicts) into the (poses, 33, 4) layout
+    """
+    landmarks = np.zeros((len(detections), len(BODY_LANDMARKS), 4), dtype=np.float32)
+    for pose, det in enumerate(detections):
+        for kp in det["keypoints"]:
+            index = LANDMARK_INDEX[kp["name"]]
+            landmarks[pose, index] = (kp["x"], kp["y"], kp.get("z", 0.0), kp.get("visibility", 1.0))
+    return landmarks
+
+
+def _indexes(names):
+    if names == "*":
+        return list(range(len(BODY_LANDMARKS)))
+    names = [names] if isinstance(names, str) else names
+    unknown = [name for name in names if name not in LANDMARK_INDEX]
+    if unknown:
+        raise ValueError(f"Unknown landmarks {unknown}.")
+    return [LANDMARK_INDEX[name] for name in names]
+
+
+
+class RuleSet:
+    # Constructor
+    def __init__(self, rules, bbox, min_visibility=0.0):
+        """
+        Fence rules compiled into index/mask tables, evaluated for every pose and rule in one pass
+        ---
+        <br/>
+        Rule formats (landmark names from MPipe._body_landmarks, "*" for all):
+            { "name", "type": "outside", "landmarks": [...], "match": "any" | "all", "frames": N }
+            { "name", "type": "above" | "below", "a": [...], "b": [...], "match": "any" | "all", "frames": N }
+        "above" pairs a[i] with b[i] (a higher in the image than b). A rule fires when it holds for
+        any pose during at least `frames` consecutive frames.
+        <br/>
+        Args:
+            rules (list): Rule dicts
+            bbox (list): Normalized fence [x1, y1, x2, y2]
+            min_visibility (float, optional): Landmarks under this visibility are ignored. Defaults to 0.0.
+        """
+        self.bbox = np.asarray(bbox, dtype=np.float32)
+        if self.bbox.shape != (4,):
+            raise ValueError("Fence 'bbox' must be [x1, y1, x2, y2].")
+        try:
+            self.min_visibility = float(min_visibility)
+        except (TypeError, ValueError):
+            raise ValueError("Fence 'min_visibility' must be a number.")
+        if not 0.0 <= self.min_visibility <= 1.0:
+            raise ValueError("Fence 'min_visibility' must be between 0 and 1.")
+        self.names = []
+        frames = []
+        outside, outside_all = [], []
+        pairs_a, pairs_b, pairs_sign, pair_all = [], [], [], []
+        pair_rows = []
+        order_outside, order_pairs = [], []
+        for rule in rules:
+            type = rule.get("type")
+            match_all = rule.get("match", "any") == "all"
+            if type == "outside":
+                mask = np.zeros(len(BODY_LANDMARKS), dtype=bool)
+                mask[_indexes(rule.get("landmarks", "*"))] = True
+                outside.append(mask)
+                outside_all.append(match_all)
+                order_outside.append(len(self.names))
+            elif type in ("above", "below"):
+                a, b = _indexes(rule["a"]), _indexes(rule["b"])
+                if len(a) != len(b):
+                    raise ValueError(f"Rule '{rule.get('name')}': 'a' and 'b' must pair the same number of landmarks.")
+                row = []
+                for ia, ib in zip(a, b):
+                    row.append(len(pairs_a))
+                    pairs_a.append(ia)
+                    pairs_b.append(ib)
+                    pairs_sign.append(1.0 if type == "above" else -1.0)
+                pair_rows.append(row)
+                pair_all.append(match_all)
+                order_pairs.append(len(self.names))
+            else:
+                raise ValueError(f"Unknown rule type '{type}'.")
+            count = rule.get("frames", 1)
+            if isinstance(count, bool) or not isinstance(count, int) or count < 1:
+                raise ValueError(f"Rule '{rule.get('name')}': 'frames' must be a positive integer.")
+            self.names.append(rule.get("name") or f"rule_{len(self.names)}")
+            frames.append(count)
+
+        self.frames = np.asarray(frames, dtype=np.int32)
+        # Outside rules: (rules, 33) landmark masks
+        self.outside = np.asarray(outside, dtype=np.int32).reshape(-1, len(BODY_LANDMARKS))
+        self.outside_all = np.asarray(outside_all, dtype=bool)
+        self.outside_order = np.asarray(order_outside, dtype=np.int64)
+        # Pair rules: flat pair table plus (rules, pairs) membership
+        self.pairs_a = np.asarray(pairs_a, dtype=np.int64)
+        self.pairs_b = np.asarray(pairs_b, dtype=np.int64)
+        self.pairs_sign = np.asarray(pairs_sign, dtype=np.float32)
+        self.pair_members = np.zeros((len(pair_rows), len(pairs_a)), dtype=np.int32)
+        for rule, row in enumerate(pair_rows):
+            self.pair_members[rule, row] = 1
+        self.pair_counts = self.pair_members.sum(axis=1)
+        self.pair_all = np.asarray(pair_all, dtype=bool)
+        self.pair_order = np.asarray(order_pairs, dtype=np.int64)
+
+
+    def hits(self, landmarks):
+        """
+        Rules holding on this frame
+        ---
+        <br/>
+        Args:
+            landmarks (np.ndarray): (poses, 33, 4) normalized x, y, z, visibility
+        Returns:
+            np.ndarray: (rules,) bool
+        """
+        hits = np.zeros(len(self.names), dtype=bool)
+        if len(landmarks) == 0 or len(self.names) == 0:
+            return hits
+        x, y, vis = landmarks[..., 0], landmarks[..., 1], landmarks[..., 3]
+        # Landmarks past the right / bottom edge are skipped (as cam.py / main.js did), negative
+        # coordinates are kept so a patient leaving the frame left or up is still outside the fence
+        valid = (x < 1) & (y < 1) & (vis >= self.min_visibility)
+
+        if len(self.outside):
+            x1, y1, x2, y2 = self.bbox
+            out = valid & ((x < x1) | (x > x2) | (y < y1) | (y > y2))
+            count_out = out.astype(np.int32) @ self.outside.T
+            count_valid = valid.astype(np.int32) @ self.outside.T
+            held = np.where(self.outside_all, (count_out == count_valid) & (count_valid > 0), count_out > 0)
+            hits[self.outside_order] = held.any(axis=0)
+
+        if len(self.pairs_a):
+            # a above b means smaller y
+            holds = valid[:, self.pairs_a] & valid[:, self.pairs_b] & (self.pairs_sign * (y[:, self.pairs_b] - y[:, self.pairs_a]) > 0)
+            count = holds.astype(np.int32) @ self.pair_members.T
+            held = np.where(self.pair_all, count == self.pair_counts, count > 0)
+            hits[self.pair_order] = held.any(axis=0)
+        return hits
+
+
+    def evaluate(self, landmarks, streaks):
+        """
+        Update consecutive frame counters and return fired rule names
+        ---
+        <br/>
+        Args:
+            landmarks (np.ndarray): (poses, 33, 4) frame landmarks
+            streaks (np.ndarray): (rules,) int32 counters of the source, updated in place
+        Returns:
+            list: Names of the rules firing on this frame
+        """
+        hits = self.hits(landmarks)
+        streaks[:] = np.where(hits, streaks + 1, 0)
+        return [self.names[i] for i in np.flatnonzero(streaks >= self.frames)]
+
+
+
+def compile_fence(fence):
+    """
+    Compile a fence rules (DEFAULT_RULES when it defines none)
+    ---
+    <br/>
+    Args:
+        fence (dict): Fence data with "bbox" and optional "rules", "min_visibility" and "alert_rules"
+            (rule names the dashboard alerts on, defaults to ["outside_fence"])
+    Returns:
+        RuleSet: Compiled rules
+    Raises:
+        ValueError: Invalid bbox, rules or alert rules
+    """
+    try:
+        rules = RuleSet(fence.get("rules") or DEFAULT_RULES, fence["bbox"], fence.get("min_visibility", 0.0))
+    except (KeyError, TypeError, AttributeError) as err:
+        raise ValueError(f"Invalid fence rules: {str(err)}")
+    alert_rules = fence.get("alert_rules")
+    if alert_rules is not None and (
+        not isinstance(alert_rules, list) or not all(name in rules.names for name in alert_rules)
+    ):
+        raise ValueError(f"Fence 'alert_rules' must be a list of its rule names: {rules.names}.")
+    return rules
+
+
+
+class RuleBook:
+    # Constructor
+    def __init__(self, fences=None):
+        """
+        Compiled rule sets by source, rebuilt when fences change
+        ---
+        <br/>
+        Args:
+            fences (dict, optional): Fences by name, each with "id" (source), "bbox" and optional "rules"
+                and "min_visibility". Defaults to None.
+        """
+        self._lock = threading.Lock()
+        self._sets = {}
+        self._streaks = {}
+        self.load(fences or {})
+
+
+    def load(self, fences):
+        """
+        Compile every fence rules (once, at load time)
+        """
+        sets = {}
+        for name, fence in fences.items():
+            source = fence.get("id")
+            if not source or "bbox" not in fence:
+                continue
+            try:
+                sets[source] = (name, compile_fence(fence))
+            except ValueError as err:
+                # Never leave a bed unchecked, fall back to the default rules
+                print(f"Fence '{name}' rules error, using default rules: {str(err)}")
+                try:
+                    sets[source] = (name, compile_fence({ "bbox": fence["bbox"] }))
+                except ValueError as err:
+                    print(f"Fence '{name}' error: {str(err)}")
+        with self._lock:
+            # Keep running streaks of sources whose rules didn't change
+            self._streaks = {
+                source: streaks for source, streaks in self._streaks.items()
+                if source in sets and sets[source][1].names == self._sets[source][1].names
+            }
+            self._sets = sets
+
+
+    def evaluate(self, source, landmarks):
+        """
+        Evaluate the source fence rules on a frame
+        ---
+        <br/>
+        Args:
+            source (str): Source id
+            landmarks (np.ndarray): (poses, 33, 4) frame landmarks
+        Returns:
+            tuple: (fence name or None, fired rule names)
+        """
+        with self._lock:
+            entry = self._sets.get(source)
+            if entry is None:
+                return None, []
+            name, rules = entry
+            streaks = self._streaks.get(source)
+            if streaks is None:
+                streaks = self._streaks[source] = np.zeros(len(rules.names), dtype=np.int32)
+            return name, rules.evaluate(landmarks, streaks)
@@ -0,0 +1,138 @@
+import time
+import threading
+
+
+class FairScheduler:
+    # Constructor
+    def __init__(self, risk_boost=4.0, risk_hold=5.0):
+        """
+        Fair share scheduler of video sources over a detector pool
+        ---
+        <br/>
+        Sources are served in stride order: each dispatch advances the source's virtual time by
+        1/weight, the ready source with the lowest virtual time goes next. Sources at risk get
+        `risk_boost` weight, so they are inferred that many times more often than stable ones.
+        <br/>
+        Args:
+            risk_boost (float, optional): Weight of sources at risk. Defaults to 4.0.
+            risk_hold (float, optional): Seconds a source keeps its boost after the last risky frame. Defaults to 5.0.
+        """
+        self.risk_boost = risk_boost
+        self.risk_hold = risk_hold
+        self._cond = threading.Condition()
+        self._sources = {}
+        self._closed = False
+
+
+    def register(self, source):
+        """
+        Add a source to the schedule
+        """
+        with self._cond:
+            self._sources[source] = {
+                "pass": self._min_pass(),
+                "ready": False,
+                "busy": False,
+                "risk_until": 0.0,
+            }
+
+
+    def unregister(self, source):
+        """
+        Remove a source from the schedule
+        """
+        with self._cond:
+            self._sources.pop(source, None)
+
+
+    def _min_pass(self):
+        passes = [s["pass"] for s in self._sources.values()]
+        return min(passes) if passes else 0.0
+
+
+    def _weight(self, state, now):
+        return self.risk_boost if state["risk_until"] > now else 1.0
+
+
+    def mark_ready(self, source):
+        """
+        A new frame is available for the source
+        """
+        with self._cond:
+            state = self._sources.get(source)
+            if state is None:
+                return
+            if not state["ready"] and not state["busy"]:
+                # Idle sources don't bank credit while waiting for frames
+                state["pass"] = max(state["pass"], self._min_pass())
+            state["ready"] = True
+            self._cond.notify()
+
+
+    def set_risk(self, source, risk):
+        """
+        Boost (or keep boosting) a source while it is at risk
+        """
+        with self._cond:
+            state = self._sources.get(source)
+            if state is not None and risk:
+                state["risk_until"] = time.time() + self.risk_hold
+
+
+    def at_risk(self, source):
+        """
+        Check if the source is currently boosted
+        """
+        with self._cond:
+            state = self._sources.get(source)
+            return state is not None and state["risk_until"] > time.time()
+
+
+    def next(self, timeout=None):
+        """
+        Block until a source is ready and claim it
+        ---
+        <br/>
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to None (forever).
+        Returns:
+            str | None: Source to infer, None on timeout or close
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while not self._closed:
+                now = time.time()
+                ready = [(state["pass"], source) for source, state in self._sources.items() if state["ready"] and not state["busy"]]
+                if ready:
+                    _, source = min(ready)
+                    state = self._sources[source]
+                    state["ready"] = False
+                    state["busy"] = True
+                    state["pass"] += 1.0 / self._weight(state, now)
+                    return source
+                remaining = None if deadline is None else deadline - now
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return None
+
+
+    def done(self, source):
+        """
+        Release a source claimed with next()
+        """
+        with self._cond:
+            state = self._sources.get(source)
+            if state is not None:
+                state["busy"] = False
+                if state["ready"]:
+                    self._cond.notify()
+
+
+    def close(self):
+        """
+        Wake up and stop every waiting worker
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
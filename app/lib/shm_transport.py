@@ -0,0 +1,319 @@
+import time
+import threading
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+from multiprocessing.connection import Listener, Client
+
+
+# Per slot header: sequence number (0 while writing), capture timestamp and frame dims
+_SLOT_HEADER = np.dtype([
+    ("seq", np.uint64),
+    ("ts", np.float64),
+    ("height", np.uint32),
+    ("width", np.uint32),
+    ("channels", np.uint32),
+    ("pad", np.uint32),
+])
+
+
+def parse_address(address):
+    """
+    Parse a notification channel address
+    ---
+    <br/>
+    Args:
+        address (str): "host:port" for a local TCP socket or a filesystem path for a unix socket
+    Returns:
+        tuple | str: Address accepted by multiprocessing Listener/Client
+    """
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return (host or "127.0.0.1", int(port))
+    return address
+
+
+class FrameRing:
+    # Constructor
+    def __init__(self, name=None, slots=4, width=640, height=480, channels=3, create=False):
+        """
+        Ring of fixed size raw frame slots in shared memory
+        ---
+        <br/>
+        Args:
+            name (str, optional): Shared memory block name. Required when attaching. Defaults to None.
+            slots (int, optional): Number of frame slots. Defaults to 4.
+            width (int, optional): Max frame width in pixels. Defaults to 640.
+            height (int, optional): Max frame height in pixels. Defaults to 480.
+            channels (int, optional): Max frame channels. Defaults to 3.
+            create (bool, optional): Create (and own) the block instead of attaching. Defaults to False.
+        """
+        self.slots = slots
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.slot_bytes = width * height * channels
+        self.owner = create
+        header_bytes = _SLOT_HEADER.itemsize * slots
+        try:
+            self.shm = shared_memory.SharedMemory(
+                name=name,
+                create=create,
+                size=header_bytes + self.slot_bytes * slots if create else 0
+            )
+        except Exception as err:
+            raise ValueError(f"SHM: Error opening frame ring: {err}")
+        self.name = self.shm.name
+        if not create:
+            # The producer owns the block, don't let our resource tracker unlink it on exit
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        # Views over the shared block, no copies
+        self.headers = np.ndarray((slots,), dtype=_SLOT_HEADER, buffer=self.shm.buf, offset=0)
+        self.data = np.ndarray((slots, self.slot_bytes), dtype=np.uint8, buffer=self.shm.buf, offset=header_bytes)
+        if create:
+            self.headers[:] = 0
+        self.seq = 0
+
+
+    def write(self, frame, ts=None):
+        """
+        Copy a raw frame into the next slot
+        ---
+        <br/>
+        Args:
+            frame (np.ndarray): HxWxC uint8 frame
+            ts (float, optional): Capture timestamp. Defaults to now.
+        Returns:
+            tuple: (slot, seq) to notify consumers with
+        """
+        h, w = frame.shape[:2]
+        c = frame.shape[2] if frame.ndim == 3 else 1
+        if h * w * c > self.slot_bytes:
+            raise ValueError(f"SHM: Frame {w}x{h}x{c} does not fit ring slot {self.width}x{self.height}x{self.channels}.")
+        self.seq += 1
+        slot = self.seq % self.slots
+        header = self.headers[slot]
+        # Mark slot as being written so readers drop it
+        header["seq"] = 0
+        self.data[slot, :h * w * c] = frame.reshape(-1)
+        header["ts"] = time.time() if ts is None else ts
+        header["height"] = h
+        header["width"] = w
+        header["channels"] = c
+        header["seq"] = self.seq
+        return slot, self.seq
+
+
+    def view(self, slot, seq):
+        """
+        Frame view in place
+        ---
+        <br/>
+        Args:
+            slot (int): Slot index
+            seq (int): Expected sequence number
+        Returns:
+            tuple | None: (frame view, capture timestamp) or None if the slot was overwritten
+        """
+        header = self.headers[slot]
+        if int(header["seq"]) != seq:
+            return None
+        h, w, c = int(header["height"]), int(header["width"]), int(header["channels"])
+        frame = self.data[slot, :h * w * c].reshape((h, w, c) if c > 1 else (h, w))
+        return frame, float(header["ts"])
+
+
+    def valid(self, slot, seq):
+        """
+        Check that a slot still holds the given frame after it has been consumed
+        """
+        return int(self.headers[slot]["seq"]) == seq
+
+
+    def close(self):
+        """
+        Release views and the shared block (unlink if owner)
+        """
+        self.headers = None
+        self.data = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+
+class FrameProducer:
+    # Constructor
+    def __init__(self, address, source, width=640, height=480, slots=4, authkey=b"snlrdevops"):
+        """
+        Capture side of the shared memory transport
+        ---
+        <br/>
+        Args:
+            address (str): Inference server notification address ("host:port" or unix socket path)
+            source (str): Source id (camera id) reported with each frame
+            width (int, optional): Max frame width. Defaults to 640.
+            height (int, optional): Max frame height. Defaults to 480.
+            slots (int, optional): Ring slots, frames in flight before overwrite. Defaults to 4.
+            authkey (bytes, optional): Notification channel auth key. Defaults to b"snlrdevops".
+        """
+        self.source = source
+        self.ring = FrameRing(slots=slots, width=width, height=height, create=True)
+        try:
+            self.conn = Client(parse_address(address), authkey=authkey)
+            # Handshake: tell the server where our ring lives
+            self.conn.send(("attach", source, self.ring.name, slots, width, height, self.ring.channels))
+        except Exception as err:
+            self.ring.close()
+            raise ValueError(f"SHM: Error connecting to inference server: {err}")
+
+
+    def submit(self, frame, normalized=True):
+        """
+        Write a frame into the ring and notify the server, non blocking
+        ---
+        <br/>
+        Args:
+            frame (np.ndarray): Raw BGR frame
+            normalized (bool, optional): Request normalized coordinates. Defaults to True.
+        Returns:
+            int: Frame sequence number
+        """
+        slot, seq = self.ring.write(frame)
+        self.conn.send(("frame", slot, seq, normalized))
+        return seq
+
+
+    def poll(self, timeout=0.0):
+        """
+        Retrieve the next result from the server
+        ---
+        <br/>
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to 0 (non blocking).
+        Returns:
+            tuple | None: (seq, detections, error) or None if nothing arrived
+        """
+        if not self.conn.poll(timeout):
+            return None
+        _, seq, detections, error = self.conn.recv()
+        return seq, detections, error
+
+
+    def infer(self, frame, normalized=True, timeout=5.0):
+        """
+        Submit a frame and wait for its result
+        ---
+        <br/>
+        Returns:
+            list: Detections as returned by MPipe.bodypose_detection
+        """
+        seq = self.submit(frame, normalized)
+        deadline = time.time() + timeout
+        while True:
+            result = self.poll(max(0.0, deadline - time.time()))
+            if result is None:
+                raise ValueError(f"SHM: Timeout waiting for frame {seq}.")
+            rseq, detections, error = result
+            # Skip stale results from frames submitted before
+            if rseq != seq:
+                continue
+            if error:
+                raise ValueError(f"SHM: {error}")
+            return detections
+
+
+    def close(self):
+        """
+        Close the channel and release the ring
+        """
+        try:
+            self.conn.close()
+        finally:
+            self.ring.close()
+
+
+
+class FrameServer:
+    # Constructor
+    def __init__(self, address, handler, authkey=b"snlrdevops", debug=False):
+        """
+        Inference side of the shared memory transport
+        ---
+        <br/>
+        Args:
+            address (str): Notification address to listen on ("host:port" or unix socket path)
+            handler (callable): handler(source, frame, normalized) -> detections, run on each frame view
+            authkey (bytes, optional): Notification channel auth key. Defaults to b"snlrdevops".
+            debug (bool, optional): Print connection events. Defaults to False.
+        """
+        self.handler = handler
+        self.debug = debug
+        try:
+            self.listener = Listener(parse_address(address), authkey=authkey)
+        except Exception as err:
+            raise ValueError(f"SHM: Error listening on {address}: {err}")
+        self.address = self.listener.address
+
+
+    def start(self):
+        """
+        Accept producers in a background thread
+        """
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except Exception as err:
+                print(f"SHM accept error: {str(err)}")
+                continue
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+
+    def _serve(self, conn):
+        """
+        Serve a single producer: attach its ring and answer each frame notification
+        """
+        ring = None
+        frame = view = None
+        try:
+            _, source, name, slots, width, height, channels = conn.recv()
+            ring = FrameRing(name=name, slots=slots, width=width, height=height, channels=channels)
+            if self.debug:
+                print(f"SHM: producer '{source}' attached ({name})")
+            while True:
+                _, slot, seq, normalized = conn.recv()
+                # Only the newest pending frame is worth inferring
+                while conn.poll():
+                    conn.send(("result", seq, None, "Frame skipped, newer frame pending."))
+                    _, slot, seq, normalized = conn.recv()
+                view = ring.view(slot, seq)
+                if view is None:
+                    conn.send(("result", seq, None, "Frame overwritten before inference."))
+                    continue
+                frame, _ = view
+                try:
+                    detections = self.handler(source, frame, normalized)
+                except Exception as err:
+                    conn.send(("result", seq, None, str(err)))
+                    continue
+                if not ring.valid(slot, seq):
+                    conn.send(("result", seq, None, "Frame overwritten during inference."))
+                    continue
+                conn.send(("result", seq, detections, None))
+        except (EOFError, OSError):
+            pass
+        except Exception as err:
+            print(f"SHM producer error: {str(err)}")
+        finally:
+            # Drop frame views before releasing the block
+            frame = view = None
+            if ring is not None:
+                ring.close()
+            conn.close()
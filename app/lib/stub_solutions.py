@@ -0,0 +1,81 @@
+import os
+import time
+import random
+import numpy as np
+from lib.landmarks import BODY_LANDMARKS
+
+
+class StubPipe:
+    # Constructor
+    def __init__(self, debug=False, bodypose=True, segmenter=True, pose_ms=None, segment_ms=None):
+        """
+        Stand in for MPipe with the same interface, for load tests without models
+        ---
+        <br/>
+        Args:
+            debug (bool, optional): Print stub settings. Defaults to False.
+            bodypose (bool, optional): Ignored, same signature as MPipe. Defaults to True.
+            segmenter (bool, optional): Ignored, same signature as MPipe. Defaults to True.
+            pose_ms (float, optional): Simulated pose inference time. Defaults to env MP_STUB_POSE_MS or 30.
+            segment_ms (float, optional): Simulated segmentation time. Defaults to env MP_STUB_SEGMENT_MS or 250.
+        """
+        self.debug = debug
+        self.pose_ms = float(pose_ms if pose_ms is not None else os.getenv("MP_STUB_POSE_MS") or 30)
+        self.segment_ms = float(segment_ms if segment_ms is not None else os.getenv("MP_STUB_SEGMENT_MS") or 250)
+        if debug:
+            print(f"Stub engine: pose {self.pose_ms}ms, segmentation {self.segment_ms}ms")
+
+
+    @staticmethod
+    def has_lite():
+        """
+        Lite model is simulated (half the pose time)
+        """
+        return True
+
+
+    # BODY LANDMARKS NAMES
+    _body_landmarks = BODY_LANDMARKS
+
+
+    def _read(self, image):
+        # Consume the upload like the real decoder does
+        if isinstance(image, np.ndarray):
+            return image.shape[1], image.shape[0]
+        image.read()
+        return 640, 480
+
+
+    def bodypose_detection(self, image, normalized=True, with_array=False, masks=True, scale=1.0, lite=False):
+        """
+        Simulated body pose detection, one person standing in the middle of the frame
+        """
+        iw, ih = self._read(image)
+        # Inference time roughly follows input pixels, lite model about half
+        time.sleep(self.pose_ms * max(scale * scale, 0.25) * (0.5 if lite else 1.0) / 1000)
+        keypoints = [
+            {
+                "name": name,
+                "x": (0.5 + random.uniform(-0.05, 0.05)) * (1 if normalized else iw),
+                "y": (0.2 + 0.6 * index / len(self._body_landmarks)) * (1 if normalized else ih),
+                "z": 0.0,
+            }
+            for index, name in enumerate(self._body_landmarks)
+        ]
+        results = [{ "segmentation_mask": None, "keypoints": keypoints, "world_keypoints": keypoints }]
+        if with_array:
+            landmarks = np.array([[
+                (kp["x"] / (1 if normalized else iw), kp["y"] / (1 if normalized else ih), 0.0, 1.0)
+                for kp in keypoints
+            ]], dtype=np.float32)
+            return results, landmarks
+        return results
+
+
+    def interactive_segmentation(self, image, touch_x, touch_y, normalized=True):
+        """
+        Simulated magic touch segmentation
+        """
+        self._read(image)
+        time.sleep(self.segment_ms / 1000)
+        return { "category_mask": None, "confidence_mask": None }
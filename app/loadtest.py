@@ -0,0 +1,274 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+import requests
+
+
+def percentile(values, p):
+    """
+    Nearest rank percentile, None for empty lists
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def build_frame(path=None):
+    """
+    Jpeg frame to upload: given file, a synthetic 640x480 frame, or random bytes if cv2 is missing
+    """
+    if path:
+        with open(path, "rb") as file:
+            return file.read()
+    try:
+        import cv2
+        import numpy as np
+        frame = np.random.randint(0, 255, (480, 640, 3), np.uint8)
+        return cv2.imencode(".jpg", frame)[1].tobytes()
+    except ImportError:
+        return os.urandom(40 * 1024)
+
+
+
+class Stats:
+    def __init__(self):
+        """
+        Thread safe per endpoint samples
+        """
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.dropped = 0
+
+
+    def add(self, endpoint, status, latency, late, queue=None):
+        with self.lock:
+            self.samples.setdefault(endpoint, []).append((status, latency, late, queue))
+
+
+    def drop(self, frames):
+        with self.lock:
+            self.dropped += frames
+
+
+    def summary(self, duration, sources):
+        """
+        Per endpoint throughput, error/429 rates, queueing delay and tail latency (ms)
+        """
+        result = { "dropped_frames": self.dropped }
+        with self.lock:
+            for endpoint, samples in self.samples.items():
+                ok = [s for s in samples if s[0] == 200]
+                latencies = [s[1] * 1000 for s in ok]
+                late = [s[2] * 1000 for s in samples]
+                queue = [s[3] for s in ok if s[3] is not None]
+                result[endpoint] = {
+                    "requests": len(samples),
+                    "fps": round(len(ok) / duration, 2),
+                    "fps_per_source": round(len(ok) / duration / sources, 2),
+                    "error_rate": round(sum(1 for s in samples if s[0] not in (200, 429)) / len(samples), 4),
+                    "busy_rate": round(sum(1 for s in samples if s[0] == 429) / len(samples), 4),
+                    "late_p95": percentile(late, 95),
+                    "queue_p50": percentile(queue, 50),
+                    "queue_p95": percentile(queue, 95),
+                    "p50": percentile(latencies, 50),
+                    "p95": percentile(latencies, 95),
+                    "p99": percentile(latencies, 99),
+                }
+        return result
+
+
+
+class LoadTest:
+    # Constructor
+    def __init__(self, url, frame, fps=5.0, segment_every=200, config_every=50):
+        """
+        Drive the server with a realistic request mix per simulated camera
+        ---
+        <br/>
+        Args:
+            url (str): Server base url
+            frame (bytes): Jpeg frame uploaded on vision requests
+            fps (float, optional): Target pose requests per second per source. Defaults to 5.
+            segment_every (int, optional): One /vision/segment every N frames per source (0 disables). Defaults to 200.
+            config_every (int, optional): One fences/alerts request every N frames per source (0 disables). Defaults to 50.
+        """
+        self.url = url.rstrip("/")
+        self.frame = frame
+        self.fps = fps
+        self.segment_every = segment_every
+        self.config_every = config_every
+
+
+    def _request(self, session, stats, endpoint, scheduled, **kwargs):
+        """
+        Timed request: latency, how late it was sent compared to its schedule and server engine queue time
+        """
+        sent = time.time()
+        queue = None
+        try:
+            method = "get" if endpoint.endswith("/load") else "post"
+            response = getattr(session, method)(f"{self.url}{endpoint}", timeout=30, **kwargs)
+            status = response.status_code
+            if status == 200 and endpoint.startswith("/vision"):
+                queue = response.json().get("queue_ms")
+        except (requests.RequestException, ValueError):
+            status = 0
+        stats.add(endpoint, status, time.time() - sent, sent - scheduled, queue)
+
+
+    def _source(self, index, stats, stop):
+        """
+        Simulated camera: paced pose requests plus occasional setup and config traffic
+        """
+        session = requests.Session()
+        interval = 1.0 / self.fps
+        # Spread sources start inside the first frame interval
+        scheduled = time.time() + random.uniform(0, interval)
+        frame_no = 0
+        while not stop.is_set():
+            time.sleep(max(0.0, scheduled - time.time()))
+            files = { "image": ("frame.jpg", self.frame, "image/jpeg") }
+            if self.segment_every and frame_no % self.segment_every == self.segment_every - 1:
+                self._request(session, stats, "/vision/segment", scheduled, files=files, data={ "x": 0.5, "y": 0.5, "normalized": "true" })
+            else:
+                self._request(session, stats, "/vision/pose", scheduled, files=files, data={ "normalized": "true", "source": f"load-{index}" })
+            if self.config_every and frame_no % self.config_every == self.config_every - 1:
+                kind = random.choice(["fences", "alerts"])
+                if random.random() < 0.5:
+                    self._request(session, stats, f"/{kind}/load", time.time())
+                else:
+                    id = f"load-{index}"
+                    data = { "name": id, "id": id, "bbox": [0.2, 0.1, 0.8, 0.9] }
+                    self._request(session, stats, f"/{kind}/save", time.time(), json={ "id": id, "data": data })
+            frame_no += 1
+            scheduled += interval
+            # Frames captured while waiting are lost, like a live camera
+            missed = int((time.time() - scheduled) / interval)
+            if missed > 0:
+                stats.drop(missed)
+                scheduled += missed * interval
+        session.close()
+
+
+    def step(self, sources, duration):
+        """
+        Run `sources` concurrent cameras for `duration` seconds
+        ---
+        <br/>
+        Returns:
+            dict: Stats.summary per endpoint
+        """
+        stats = Stats()
+        stop = threading.Event()
+        threads = [threading.Thread(target=self._source, args=(i, stats, stop), daemon=True) for i in range(sources)]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=35)
+        return stats.summary(duration, sources)
+
+
+    def cleanup(self, sources):
+        """
+        Remove the fences/alerts created by the test
+        """
+        for kind in ("fences", "alerts"):
+            for i in range(sources):
+                try:
+                    requests.post(f"{self.url}/{kind}/remove", json={ "id": f"load-{i}" }, timeout=5)
+                except requests.RequestException:
+                    pass
+
+
+
+def start_server(port, stub=True, pose_ms=30, segment_ms=250):
+    """
+    Start server.py locally (from this folder) without debug reloader, on a throwaway data folder
+    """
+    env = dict(os.environ, PORT=str(port), DEBUG="false", DATA_DIR=tempfile.mkdtemp(prefix="loadtest-"))
+    if stub:
+        env.update(MP_STUB="true", MP_STUB_POSE_MS=str(pose_ms), MP_STUB_SEGMENT_MS=str(segment_ms))
+    process = subprocess.Popen(
+        [sys.executable, "server.py"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    # Wait until listening
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/fences/load", timeout=1)
+            return process
+        except requests.RequestException:
+            if process.poll() is not None:
+                raise RuntimeError("Server exited during startup.")
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("Server did not start in time.")
+
+
+def print_step(sources, summary):
+    print(f"\n== {sources} sources, {summary['dropped_frames']} frames dropped ==")
+    print(f"{'endpoint':<18}{'reqs':>7}{'fps':>9}{'fps/src':>9}{'err%':>7}{'429%':>7}{'late95':>8}{'queue50':>9}{'queue95':>9}{'p50':>8}{'p95':>8}{'p99':>8}")
+    fmt = lambda v: "-" if v is None else f"{v:.0f}"
+    for endpoint, st in sorted(summary.items()):
+        if endpoint == "dropped_frames":
+            continue
+        print(
+            f"{endpoint:<18}{st['requests']:>7}{st['fps']:>9}{st['fps_per_source']:>9}"
+            f"{st['error_rate'] * 100:>7.1f}{st['busy_rate'] * 100:>7.1f}{fmt(st['late_p95']):>8}"
+            f"{fmt(st['queue_p50']):>9}{fmt(st['queue_p95']):>9}{fmt(st['p50']):>8}{fmt(st['p95']):>8}{fmt(st['p99']):>8}"
+        )
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End to end HTTP load test for server.py")
+    parser.add_argument("--url", default=None, help="Running server url. A local server is started if not set.")
+    parser.add_argument("--port", type=int, default=8099, help="Port of the local server")
+    parser.add_argument("--real", action="store_true", help="Local server with real models instead of the stub detector")
+    parser.add_argument("--pose-ms", type=float, default=30, help="Stub pose inference time")
+    parser.add_argument("--segment-ms", type=float, default=250, help="Stub segmentation time")
+    parser.add_argument("--sources", default="1,2,4,8,16", help="Comma separated concurrency steps")
+    parser.add_argument("--fps", type=float, default=5.0, help="Pose requests per second per source")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per step")
+    parser.add_argument("--segment-every", type=int, default=200, help="One segmentation every N frames per source (0 disables)")
+    parser.add_argument("--config-every", type=int, default=50, help="One fences/alerts request every N frames per source (0 disables)")
+    parser.add_argument("--image", default=None, help="Jpeg frame to upload")
+    parser.add_argument("--json", default=None, help="Write the results curve to this file")
+    args = parser.parse_args()
+
+    steps = [int(n) for n in args.sources.split(",")]
+    process = None
+    url = args.url
+    if url is None:
+        process = start_server(args.port, stub=not args.real, pose_ms=args.pose_ms, segment_ms=args.segment_ms)
+        url = f"http://127.0.0.1:{args.port}"
+
+    test = LoadTest(url, build_frame(args.image), args.fps, args.segment_every, args.config_every)
+    curve = []
+    try:
+        for sources in steps:
+            summary = test.step(sources, args.duration)
+            print_step(sources, summary)
+            curve.append({ "sources": sources, "endpoints": summary })
+    finally:
+        test.cleanup(max(steps))
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(curve, file, indent=2)
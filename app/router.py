@@ -0,0 +1,635 @@
+import os
+import sys
+import math
+import time
+import signal
+import argparse
+import threading
+import requests
+from flask_cors import CORS
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, request, jsonify, stream_with_context
+from lib.cluster import HashRing
+
+
+# Flask app instance
+app = Flask(__name__)
+# Enable cors origin for all paths
+CORS(app)
+
+# Sources to nodes assignment
+RING = HashRing(vnodes=int(os.getenv("VNODES") or 64))
+# Registered nodes, up or down: { url: { "up", "misses", "since" } }
+NODES = {}
+NODES_LOCK = threading.RLock()
+# Sources seen by the router, to report rebalancing: { source: last request epoch }
+SOURCES = {}
+# Upstream connections and parallel fan out (replication, keypoints batches, queries)
+SESSION = requests.Session()
+SESSION.mount("http://", requests.adapters.HTTPAdapter(pool_connections=64, pool_maxsize=64))
+POOL = ThreadPoolExecutor(max_workers=int(os.getenv("ROUTER_FANOUT") or 16))
+# Node request timeout (seconds)
+TIMEOUT = float(os.getenv("NODE_TIMEOUT") or 30)
+# Health checks: interval (seconds) and failed checks before a node leaves the ring
+HEALTH_INTERVAL = float(os.getenv("HEALTH_INTERVAL") or 2)
+HEALTH_MISSES = int(os.getenv("HEALTH_MISSES") or 2)
+# Config replicated to every node
+CONFIG = ("fences", "alerts")
+# Hop by hop headers never relayed
+HOP_HEADERS = { "connection", "keep-alive", "transfer-encoding", "content-encoding", "content-length", "te", "upgrade" }
+
+
+# ----------------------------------------
+# --------------- Response standards -----
+# ----------------------------------------
+
+def user_error(error):
+    """
+    Args:
+        error (str): Error message
+    """
+    return jsonify({ "status": "fail", "error": error }), 400
+
+def server_error(error):
+    """
+    Args:
+        error (str): Error message
+    """
+    return jsonify({ "status": "fail", "error": f"Server error: {error}" }), 500
+
+def unavailable(error):
+    """
+    Args:
+        error (str): Error message
+    """
+    return jsonify({ "status": "fail", "error": error }), 503
+
+def success(response):
+    """
+    Args:
+        response (dict): Response object
+    """
+    response["status"] = "ok"
+    return jsonify(response), 200
+
+
+def relay(res):
+    """
+    Node response as a router response
+    """
+    headers = [(name, value) for name, value in res.headers.items() if name.lower() not in HOP_HEADERS]
+    return Response(res.content, status=res.status_code, headers=headers)
+
+
+# ----------------------------------------
+# --------------- MEMBERSHIP STUFF -------
+# ----------------------------------------
+
+def assignments():
+    """
+    Owner of every source seen so far
+    """
+    return RING.assign(list(SOURCES))
+
+
+def moves(before):
+    """
+    Sources whose owner changed since `before` (as returned by assignments)
+    """
+    after = assignments()
+    return { source: { "from": before.get(source), "to": node } for source, node in after.items() if before.get(source) != node }
+
+
+def sync_config(node):
+    """
+    Copy fences and alerts of a healthy node to a node about to join the ring
+    """
+    peers = [peer for peer in RING.nodes() if peer != node]
+    if not peers:
+        # First node, its config is the cluster config
+        return
+    for name in CONFIG:
+        wanted = SESSION.get(f"{peers[0]}/{name}/load", timeout=TIMEOUT).json()["data"]
+        current = SESSION.get(f"{node}/{name}/load", timeout=TIMEOUT).json()["data"]
+        for id, data in wanted.items():
+            if current.get(id) != data:
+                SESSION.post(f"{node}/{name}/save", json={ "id": id, "data": data }, timeout=TIMEOUT).raise_for_status()
+        for id in current:
+            if id not in wanted:
+                SESSION.post(f"{node}/{name}/remove", json={ "id": id }, timeout=TIMEOUT).raise_for_status()
+
+
+def node_up(node):
+    """
+    Sync config and place a (re)joining node on the ring
+    ---
+    Returns:
+        dict: Moved sources
+    """
+    with NODES_LOCK:
+        before = assignments()
+        sync_config(node)
+        RING.add(node)
+        NODES[node].update(up=True, misses=0, since=time.time())
+        moved = moves(before)
+    print(f"Node {node} joined, {len(moved)} sources moved")
+    return moved
+
+
+def node_down(node, forget=False):
+    """
+    Take a node off the ring, its sources move to the next nodes
+    ---
+    Returns:
+        dict: Moved sources
+    """
+    with NODES_LOCK:
+        before = assignments()
+        RING.remove(node)
+        if forget:
+            NODES.pop(node, None)
+        elif node in NODES:
+            NODES[node].update(up=False, since=time.time())
+        moved = moves(before)
+    print(f"Node {node} left, {len(moved)} sources moved")
+    return moved
+
+
+def join(node):
+    """
+    Register a node and bring it up if it answers
+    """
+    node = node.rstrip("/")
+    with NODES_LOCK:
+        NODES.setdefault(node, { "up": False, "misses": 0, "since": time.time() })
+    SESSION.get(f"{node}/lanes", timeout=TIMEOUT).raise_for_status()
+    return node, node_up(node)
+
+
+def health_loop():
+    """
+    Nodes failing HEALTH_MISSES checks leave the ring, and join again once they answer
+    """
+    while True:
+        time.sleep(HEALTH_INTERVAL)
+        for node, state in list(NODES.items()):
+            try:
+                SESSION.get(f"{node}/lanes", timeout=min(TIMEOUT, HEALTH_INTERVAL)).raise_for_status()
+                state["misses"] = 0
+                if not state["up"]:
+                    node_up(node)
+            except Exception as err:
+                state["misses"] += 1
+                if state["up"] and state["misses"] >= HEALTH_MISSES:
+                    print(f"Node {node} health check error: {str(err)}")
+                    node_down(node)
+
+
+# ----------------------------------------
+# --------------- FORWARDING STUFF -------
+# ----------------------------------------
+
+def owner(source, seen=True):
+    """
+    Node serving a source (or any other routing key when not `seen`)
+    """
+    if seen:
+        SOURCES[source] = time.time()
+    return RING.owner(source)
+
+
+def request_kwargs():
+    """
+    Current request as requests keyword arguments (bodies buffered, so it can be sent again)
+    """
+    kwargs = { "params": request.args }
+    if request.files:
+        kwargs["data"] = request.form
+        kwargs["files"] = { name: (file.filename, file.read(), file.mimetype) for name, file in request.files.items() }
+    elif request.form:
+        kwargs["data"] = request.form
+    else:
+        kwargs["data"] = request.get_data()
+        if request.content_type:
+            kwargs["headers"] = { "Content-Type": request.content_type }
+    return kwargs
+
+
+def forward(key, seen=True):
+    """
+    Send the current request to the node owning `key`, retried once on the next owner if the node is gone
+    """
+    kwargs = request_kwargs()
+    for _ in range(2):
+        node = owner(key, seen)
+        if node is None:
+            return unavailable("No inference nodes available.")
+        try:
+            res = SESSION.request(request.method, f"{node}{request.path}", timeout=TIMEOUT, allow_redirects=False, **kwargs)
+            return relay(res)
+        except requests.ConnectionError:
+            node_down(node)
+    return unavailable("Inference nodes unreachable.")
+
+
+def replicate(path, payload):
+    """
+    Send a config change to every node on the ring
+    ---
+    Returns:
+        tuple: (first node response, { node: error } for unreachable nodes)
+    """
+    nodes = RING.nodes()
+    calls = { node: POOL.submit(SESSION.post, f"{node}{path}", json=payload, timeout=TIMEOUT) for node in nodes }
+    first, failed = None, {}
+    for node, call in calls.items():
+        try:
+            res = call.result()
+            # Prefer a successful answer, otherwise relay the node error (same config, same error everywhere)
+            if first is None or (first.status_code != 200 and res.status_code == 200):
+                first = res
+        except requests.RequestException as err:
+            failed[node] = str(err)
+    return first, failed
+
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+@app.route('/vision/pose', methods=['POST'])
+@app.route('/vision/segment', methods=['POST'])
+def vision_forward():
+    """
+    Forward a frame to the node owning its source (client or address when no source)
+    ---
+    """
+    try:
+        source = request.form.get("source")
+        if source:
+            return forward(source)
+        return forward(request.form.get("client") or request.remote_addr, seen=False)
+    except Exception as err:
+        print(f"Vision forward error: {str(err)}")
+        return server_error(f"Vision forward error: {str(err)}")
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+@app.route('/vision/keypoints', methods=['POST'])
+def keypoints_forward():
+    """
+    Split a landmarks batch by source owner and forward each part
+    ---
+    Args:
+        frames* (list): Frames as accepted by the node /vision/keypoints
+        node (str): Edge node id
+    Returns:
+        json: "frames" with { "source", "risk" } per frame, or { "source", "error" } when its node failed
+    """
+    try:
+        params = request.get_json(silent=True) or {}
+        frames = params.get("frames")
+        if not isinstance(frames, list):
+            return user_error("Required param 'frames' not found.")
+
+        for frame in frames:
+            if not isinstance(frame, dict) or not isinstance(frame.get("source"), str) or not frame["source"]:
+                return user_error("Required frame param 'source' not found.")
+
+        # Frames of unreachable nodes are grouped again by their new owner, once
+        results = [None] * len(frames)
+        pending = list(range(len(frames)))
+        failed = None
+        for _ in range(2):
+            # Group frames by owner, keeping their batch position
+            parts = {}
+            for index in pending:
+                node = owner(frames[index]["source"])
+                if node is None:
+                    return unavailable("No inference nodes available.")
+                parts.setdefault(node, []).append(index)
+
+            calls = {
+                node: POOL.submit(SESSION.post, f"{node}/vision/keypoints", json={ "node": params.get("node"), "frames": [frames[i] for i in indexes] }, timeout=TIMEOUT)
+                for node, indexes in parts.items()
+            }
+            pending = []
+            for node, call in calls.items():
+                try:
+                    res = call.result()
+                except requests.ConnectionError:
+                    node_down(node)
+                    pending += parts[node]
+                    continue
+                except requests.RequestException as err:
+                    error = f"Node error: {str(err)}"
+                else:
+                    if res.status_code == 200:
+                        for index, item in zip(parts[node], res.json()["frames"]):
+                            results[index] = item
+                        continue
+                    failed = res
+                    error = f"Node answered {res.status_code}."
+                # Per frame errors, the other parts still went through
+                for index in parts[node]:
+                    results[index] = { "source": frames[index]["source"], "error": error }
+            if not pending:
+                break
+        for index in pending:
+            results[index] = { "source": frames[index]["source"], "error": "Inference nodes unreachable." }
+
+        if frames and all("error" in item for item in results):
+            # Nothing went through, answer as a node would (busy, malformed frames ...)
+            return relay(failed) if failed is not None else unavailable(results[0]["error"])
+        return success({ "frames": results })
+    except Exception as err:
+        print(f"Keypoints forward error: {str(err)}")
+        return server_error(f"Keypoints forward error: {str(err)}")
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+@app.route('/streams/<source>', methods=['GET'])
+def stream_forward(source):
+    """
+    Relay a source results stream, closed when the source moves so the EventSource reconnects to its new owner
+    ---
+    """
+    node = owner(source)
+    if node is None:
+        return unavailable("No inference nodes available.")
+    try:
+        res = SESSION.get(f"{node}/streams/{source}", params=request.args, stream=True, timeout=TIMEOUT)
+    except requests.RequestException as err:
+        return unavailable(f"Stream error: {str(err)}")
+
+    def events():
+        try:
+            # Node heartbeats make sure ownership is checked at least every 15 seconds
+            for chunk in res.iter_content(chunk_size=None):
+                yield chunk
+                if RING.owner(source) != node:
+                    break
+        finally:
+            res.close()
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream", headers={ "Cache-Control": "no-cache" })
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+@app.route('/incidents/record', methods=['POST'])
+def incident_forward():
+    """
+    Record an incident on the node owning its source
+    ---
+    """
+    try:
+        params = request.get_json(silent=True) or {}
+        if "source" not in params:
+            return user_error("Missing required parameter source.")
+        return forward(params["source"])
+    except Exception as err:
+        print(f"Record incident error: {str(err)}")
+        return server_error(f"Record incident error: {str(err)}")
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+@app.route('/incidents/query', methods=['GET'])
+def incidents_query():
+    """
+    Query incidents on every node (history stays where it was recorded), newest first
+    ---
+    Args:
+        Same as the node /incidents/query, "cursor" is the "next" value of the previous router page
+    """
+    try:
+        params = request.args.to_dict()
+        limit = min(max(request.args.get("limit", 100, type=int), 1), 1000)
+        for name in ("start", "end", "hours"):
+            try:
+                valid = name not in params or math.isfinite(float(params[name]))
+            except ValueError:
+                valid = False
+            if not valid:
+                return user_error(f"Parameter '{name}' must be a number.")
+
+        # Router cursor: last item returned as "ts|node|offset", offset among that node items sharing ts
+        cursor = params.pop("cursor", None)
+        if cursor is not None:
+            try:
+                cts, cnode, coffset = cursor.split("|")
+                cts, coffset = float(cts), int(coffset)
+                if not math.isfinite(cts):
+                    raise ValueError
+            except ValueError:
+                return user_error("Invalid cursor.")
+
+        def node_params(node):
+            if cursor is None:
+                return params
+            # Nodes ordered before the cursor node already returned every item at the boundary ts,
+            # the cursor node returned `offset + 1` of them (fetched again and skipped), later nodes none
+            if node < cnode:
+                return { **params, "end": min(float(params.get("end", cts)), math.nextafter(cts, -math.inf)) }
+            if node == cnode:
+                return { **params, "end": min(float(params.get("end", cts)), cts), "limit": limit + coffset + 1 }
+            return { **params, "end": min(float(params.get("end", cts)), cts) }
+
+        nodes = RING.nodes()
+        calls = { node: POOL.submit(SESSION.get, f"{node}/incidents/query", params=node_params(node), timeout=TIMEOUT) for node in nodes }
+        items, more = [], False
+        for node, call in calls.items():
+            res = call.result()
+            data = res.json()
+            if data.get("status") != "ok":
+                return relay(res) if res.status_code == 400 else server_error(f"{node}: {data.get('error')}")
+            more = more or data.get("next") is not None
+            # Total order: ts (newest first), node, position among the node items sharing ts
+            offset, last_ts = 0, None
+            for item in data["data"]:
+                offset = offset + 1 if item["ts"] == last_ts else 0
+                last_ts = item["ts"]
+                key = (-item["ts"], node, offset)
+                if cursor is None or key > (-cts, cnode, coffset):
+                    items.append((key, item))
+
+        items.sort(key=lambda entry: entry[0])
+        more = more or len(items) > limit
+        items = items[:limit]
+
+        next = None
+        if more and items:
+            (ts, node, offset), _ = items[-1]
+            next = f"{-ts}|{node}|{offset}"
+
+        # Return response
+        return success({ "data": [item for _, item in items], "next": next })
+    except Exception as err:
+        print(f"Query incidents error: {str(err)}")
+        return server_error(f"Query incidents error: {str(err)}")
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+# ----------------------------------------
+# --------------- CONFIG STUFF -----------
+# ----------------------------------------
+
+@app.route('/fences/save', methods=['POST'])
+@app.route('/fences/remove', methods=['POST'])
+@app.route('/alerts/save', methods=['POST'])
+@app.route('/alerts/remove', methods=['POST'])
+def config_replicate():
+    """
+    Apply a fences / alerts change on every node
+    ---
+    """
+    try:
+        params = request.get_json(silent=True)
+        if not params or "id" not in params:
+            return user_error('Missing required param "id".')
+
+        # Membership changes (and the config sync of joining nodes) wait for the change to be applied everywhere
+        with NODES_LOCK:
+            first, failed = replicate(request.path, params)
+            # Nodes that missed the change get the cluster config again when they rejoin
+            for node in failed:
+                node_down(node)
+        if failed:
+            return server_error(f"Config not applied on {', '.join(failed)}.")
+        if first is None:
+            return unavailable("No inference nodes available.")
+
+        return relay(first)
+    except Exception as err:
+        print(f"Config replicate error: {str(err)}")
+        return server_error(f"Config replicate error: {str(err)}")
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+# ----------------------------------------
+# --------------- CLUSTER STUFF ----------
+# ----------------------------------------
+
+@app.route('/cluster', methods=['GET'])
+def cluster_status():
+    """
+    Nodes state and source assignment
+    ---
+    """
+    try:
+        owners = assignments()
+        nodes = {
+            node: { **state, "sources": sorted(source for source, owner in owners.items() if owner == node) }
+            for node, state in NODES.items()
+        }
+        return success({ "data": { "nodes": nodes, "ring": RING.nodes() } })
+    except Exception as err:
+        print(f"Cluster status error: {str(err)}")
+        return server_error(f"Cluster status error: {str(err)}")
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+@app.route('/cluster/join', methods=['POST'])
+def cluster_join():
+    """
+    Add a node, it gets the cluster config before receiving sources
+    ---
+    Args:
+        url* (str): Node base url
+    """
+    try:
+        params = request.get_json(silent=True) or {}
+        if "url" not in params:
+            return user_error('Missing required param "url".')
+        try:
+            node, moved = join(params["url"])
+        except requests.RequestException as err:
+            return user_error(f"Node not reachable: {str(err)}")
+        return success({ "node": node, "moved": moved })
+    except Exception as err:
+        print(f"Cluster join error: {str(err)}")
+        return server_error(f"Cluster join error: {str(err)}")
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+@app.route('/cluster/leave', methods=['POST'])
+def cluster_leave():
+    """
+    Remove a node, its sources move to the remaining nodes
+    ---
+    Args:
+        url* (str): Node base url
+    """
+    try:
+        params = request.get_json(silent=True) or {}
+        if "url" not in params:
+            return user_error('Missing required param "url".')
+        node = params["url"].rstrip("/")
+        if node not in NODES:
+            return user_error(f"Unknown node {node}.")
+        return success({ "node": node, "moved": node_down(node, forget=True) })
+    except Exception as err:
+        print(f"Cluster leave error: {str(err)}")
+        return server_error(f"Cluster leave error: {str(err)}")
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+@app.route('/', defaults={ "path": "" }, methods=['GET', 'POST'])
+@app.route('/<path:path>', methods=['GET', 'POST'])
+def any_forward(path):
+    """
+    Dashboard, login and everything else: any node can answer, sticky by client address
+    ---
+    """
+    try:
+        return forward(request.remote_addr, seen=False)
+    except Exception as err:
+        print(f"Forward error: {str(err)}")
+        return server_error(f"Forward error: {str(err)}")
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Router sharding camera sources across server.py nodes")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT") or 8080), help="Router port")
+    parser.add_argument("--node", action="append", default=[], metavar="URL",
+                        help="Node base url, e.g. http://10.0.0.5:8080. Repeat for each node.")
+    parser.add_argument("--spawn", type=int, default=0, help="Start this many local server.py nodes (testing)")
+    parser.add_argument("--base-port", type=int, default=8101, help="First port of the spawned nodes")
+    parser.add_argument("--real", action="store_true", help="Spawned nodes with real models instead of the stub detector")
+    parser.add_argument("--pose-ms", type=float, default=30, help="Stub pose inference time of spawned nodes")
+    parser.add_argument("--segment-ms", type=float, default=250, help="Stub segmentation time of spawned nodes")
+    args = parser.parse_args()
+
+    processes = []
+    # Terminating the router also stops its spawned nodes
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    if args.spawn:
+        from loadtest import start_server
+        for index in range(args.spawn):
+            port = args.base_port + index
+            processes.append(start_server(port, stub=not args.real, pose_ms=args.pose_ms, segment_ms=args.segment_ms))
+            args.node.append(f"http://127.0.0.1:{port}")
+
+    nodes = args.node + [url for url in (os.getenv("NODES") or "").split(",") if url]
+    for url in nodes:
+        try:
+            join(url)
+        except requests.RequestException as err:
+            print(f"Node {url} not reachable yet: {str(err)}")
+    threading.Thread(target=health_loop, daemon=True).start()
+
+    try:
+        app.run(host="0.0.0.0", port=args.port, threaded=True)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
@@ -1,10 +1,28 @@
 import os
+import io
 import json
+import math
+import time
 import requests
+import threading
 from pathlib import Path
 from flask_cors import CORS
-from lib.mp_solutions import MPipe
-from flask import Flask, request, jsonify, render_template, redirect, url_for
+from lib.shm_transport import FrameServer
+from lib.incident_log import IncidentLog
+from lib.pubsub import ResultHub, annotate_thumbnail
+from lib.pose_recorder import PoseRecorder
+from lib.lanes import Lane, LaneFull
+from lib.qos import QoSController, LEVELS, without_lite
+from lib.rules import RuleBook, compile_fence
+from lib.keypoints import decode_frame, array_to_detections
+from flask import Flask, Response, request, jsonify, render_template, redirect, url_for, stream_with_context
+
+
+# Stub detector for load tests (no models needed)
+if os.getenv("MP_STUB", "false").lower() == "true":
+    from lib.stub_solutions import StubPipe as MPipe
+else:
+    from lib.mp_solutions import MPipe
 
 
 # Flask app instance
@@ -12,12 +30,49 @@ app = Flask(__name__)
 # Enable cors origin for all paths
 CORS(app)
 
-mp = MPipe(debug=True)
+# Live pose lane: dedicated workers, each with its own engine, never used by setup work
+POSE_LANE = Lane(
+    "pose",
+    lambda: MPipe(debug=True, segmenter=False),
+    workers=int(os.getenv("POSE_WORKERS") or 1),
+    max_pending=int(os.getenv("POSE_PENDING") or 16)
+)
+# Interactive segmentation lane (fence drawing), isolated from live monitoring
+SEGMENT_LANE = Lane(
+    "segment",
+    lambda: MPipe(debug=True, bodypose=False),
+    workers=int(os.getenv("SEGMENT_WORKERS") or 1),
+    max_pending=int(os.getenv("SEGMENT_PENDING") or 4)
+)
+# Sources at risk jump the pose queue until this epoch
+AT_RISK = {}
+RISK_HOLD = 10
+# Per source latency budget, quality is degraded before frames lag behind
+QOS = QoSController(
+    budget_ms=float(os.getenv("LATENCY_BUDGET_MS") or 200),
+    levels=LEVELS if MPipe.has_lite() else without_lite()
+)
+
+# Landmark frames accepted per /vision/keypoints request
+KEYPOINTS_BATCH = int(os.getenv("KEYPOINTS_BATCH") or 512)
+# Fences/alerts files and dicts
+FILES_LOCK = threading.RLock()
+# Per source results fan out, one inference serves every viewer
+HUB = ResultHub()
 
 # Retrieve entironment variables
 MASTER_USER = os.getenv("MASTER_USER") or "admin"
 MASTER_PASS = os.getenv("MASTER_PASS") or "admin"
 TOKEN = os.getenv("TKN") or "snlrdevops"
+# Shared memory frame transport address for co-located capture processes ("host:port" or socket path)
+SHM_ADDRESS = os.getenv("SHM_ADDRESS")
+# Fences, alerts and incidents folder
+DATA_DIR = Path(os.getenv("DATA_DIR") or "./data")
+# Record per source landmarks for replays
+POSE_RECORD = (os.getenv("POSE_RECORD") or "false").lower() == "true"
+# Server run config
+PORT = int(os.getenv("PORT") or 8080)
+DEBUG = (os.getenv("DEBUG") or "true").lower() == "true"
     
 # ----------------------------------------
 # --------------- ALERTS R/W STUFF -------
@@ -25,7 +80,7 @@ TOKEN = os.getenv("TKN") or "snlrdevops"
 
 
 # Fences references
-ALERTS_PATH = Path("./data/alerts.json")
+ALERTS_PATH = DATA_DIR / "alerts.json"
 ALERTS_PATH.parent.mkdir(parents=True, exist_ok=True)  # ensure ./data exists
 ALERTS = None
 alerts_file = None
@@ -51,7 +106,7 @@ except FileNotFoundError:
 # ----------------------------------------
 
 # Fences references
-FENCES_PATH = Path("./data/fences.json")
+FENCES_PATH = DATA_DIR / "fences.json"
 FENCES_PATH.parent.mkdir(parents=True, exist_ok=True)  # ensure ./data exists
 FENCES = None
 fences_file = None
@@ -72,6 +127,18 @@ except FileNotFoundError:
     json.dump(FENCES, fences_file, ensure_ascii=False, indent=2)
     fences_file.flush()
     
+# ----------------------------------------
+# --------------- INCIDENTS STUFF --------
+# ----------------------------------------
+
+# Fence breaches and risky poses history, bounded by rotation/retention
+INCIDENTS = IncidentLog(DATA_DIR / "incidents")
+
+# Memory mapped landmarks recorder (POSE_RECORD=true)
+RECORDER = PoseRecorder(DATA_DIR / "poses") if POSE_RECORD else None
+
+# Fence rules compiled per source, rebuilt on fences changes
+RULES = RuleBook(FENCES)
 
 
 # ----------------------------------------
@@ -86,11 +153,12 @@ def get_file(name):
     global alerts_file
     
     file = fences_file if name == "fences" else alerts_file
-    file.seek(0)  # back to begining
-    try:
-        return json.load(file)
-    except json.JSONDecodeError:
-        return {}  # Empty or corrupted file
+    with FILES_LOCK:
+        file.seek(0)  # back to begining
+        try:
+            return json.load(file)
+        except json.JSONDecodeError:
+            return {}  # Empty or corrupted file
 
 
 def update_file(name, data):
@@ -102,10 +170,11 @@ def update_file(name, data):
     
     file = fences_file if name == "fences" else alerts_file
     
-    file.seek(0)  # back to begining
-    json.dump(data, file, ensure_ascii=False, indent=2)
-    file.truncate() # Delete exeded data
-    file.flush() 
+    with FILES_LOCK:
+        file.seek(0)  # back to begining
+        json.dump(data, file, ensure_ascii=False, indent=2)
+        file.truncate() # Delete exeded data
+        file.flush() 
     
 
 
@@ -127,6 +196,13 @@ def server_error(error):
     """
     return jsonify({ "status": "fail", "error": f"Server error: {error}" }), 500
 
+def busy(error):
+    """
+    Args:
+        error (str): Error message
+    """
+    return jsonify({ "status": "fail", "error": error }), 429
+
 def success(response):
     """
     Args:
@@ -194,6 +270,71 @@ def home():
 # ----------------------------------------
 # --------------- MEDIAPIPE STUFF --------
 # ----------------------------------------
+
+def mark_risk(source):
+    """
+    Serve the source first for the next RISK_HOLD seconds
+    """
+    AT_RISK[source] = time.time() + RISK_HOLD
+
+
+def at_risk(source):
+    return bool(source) and AT_RISK.get(source, 0) > time.time()
+
+
+def infer_pose(source, image, normalized):
+    """
+    Body pose on the live lane, sources at risk first, at the source QoS level, then fence rules
+    ---
+    Returns:
+        tuple: (detections, queue wait in ms, fired rule names)
+    Raises:
+        LaneFull: Too many frames already waiting
+    """
+    with_array = bool(source)
+    priority = 0 if at_risk(source) else 1
+    qos = QOS.params(source) if source else QOS.levels[0]
+    started = time.time()
+    try:
+        results, queue_ms = POSE_LANE.run(
+            lambda engine: engine.bodypose_detection(
+                image, normalized, with_array=with_array, masks=qos["masks"], scale=qos["scale"], lite=qos["lite"]
+            ),
+            priority
+        )
+    except LaneFull:
+        # A rejected frame is a blown budget
+        if source:
+            QOS.observe(source, QOS.budget_ms * 2)
+        raise
+    if not source:
+        return results, queue_ms, []
+    QOS.observe(source, (time.time() - started) * 1000)
+    results, landmarks = results
+    return results, queue_ms, process_landmarks(source, landmarks)
+
+
+def process_landmarks(source, landmarks, ts=None, tracks=None):
+    """
+    Server side fence rules, incidents and recording of a source frame
+    ---
+    Args:
+        source (str): Source id
+        landmarks (np.ndarray): (poses, 33, 4) normalized x, y, z, visibility
+        ts (float): Frame epoch seconds, defaults to now
+        tracks (list): Track id per pose, defaults to the pose index
+    Returns:
+        list: Fired rule names
+    """
+    if RECORDER is not None:
+        RECORDER.append(source, landmarks, ts, tracks)
+    fence, fired = RULES.evaluate(source, landmarks)
+    for rule in fired:
+        INCIDENTS.append(source, rule, { "fence": fence }, ts)
+    if fired:
+        mark_risk(source)
+    return fired
+
     
 @app.route('/vision/pose', methods=['POST'])
 def pose_detect():
@@ -203,11 +344,12 @@ def pose_detect():
     Args:
         image* (file): Image file
         normalized (bool): Normalized coordinates
+        source (str): Source id, results are shared with the source subscribers
+        client (str): Viewer id, only the source producer runs inference
     """
     # Preflight
     if request.method == "OPTIONS":
         return ("", 204)
-    global mp
     try:
         # Retrieve and validate params        
         if 'image' not in request.files:
@@ -220,13 +362,43 @@ def pose_detect():
         # Retrieve normalized param
         normalized = params.get("normalized", "false").lower() == "true"
         track = params.get("track", "false").lower() == "true"
+        source = params.get("source")
+        client = params.get("client") or request.remote_addr
+        
+        # Another viewer already infers this source, share its results
+        if source and not HUB.claim(source, client):
+            latest = HUB.latest(source) or {}
+            return success({ "detections": latest.get("detections", []), "producer": False })
+        
+        # Stable sources on the lowest QoS level skip frames, reuse the last result
+        if source and QOS.skip(source, at_risk(source)):
+            latest = HUB.latest(source) or {}
+            return success({ "detections": latest.get("detections", []), "producer": True, "skipped": True, "qos": QOS.params(source)["name"] })
         
-        # Request inference
-        results = mp.bodypose_detection(image, normalized)
+        # Keep the frame bytes for viewers asking for thumbnails
+        frame_bytes = None
+        if source and HUB.wants_thumbnails(source):
+            frame_bytes = image.read()
+            image = io.BytesIO(frame_bytes)
         
-        results = { "detections": results }
+        # Request inference, shed load when too many frames are already waiting
+        try:
+            results, queue_ms, risk = infer_pose(source, image, normalized)
+        except LaneFull:
+            return busy("Pose engine busy, retry later.")
+        
+        results = { "detections": results, "queue_ms": queue_ms }
+        if source:
+            results["qos"] = QOS.params(source)["name"]
+            results["risk"] = risk
         if track:
             results["warning"] = "Body pose detects only one people result, prefering the closer person."
+        
+        if source:
+            # Fan out to subscribers
+            thumbnail = annotate_thumbnail(frame_bytes, results["detections"]) if frame_bytes and normalized else None
+            HUB.publish(source, { "detections": results["detections"], "normalized": normalized, "risk": risk }, thumbnail)
+            results["producer"] = True
             
         return success(results)
     except Exception as err:
@@ -234,6 +406,61 @@ def pose_detect():
         return server_error(f"Pose detection error: {str(err)}")
 # --------------------------------------------------------------------
 # --------------------------------------------------------------------
+
+
+@app.route('/vision/keypoints', methods=['POST'])
+def keypoints_ingest():
+    """
+    Ingest landmarks inferred on edge nodes, same fence rules, incidents, recording and fan out as /vision/pose
+    ---
+    Args:
+        frames* (list): Batched frames of any sources, each { "source", "ts", "tracks", "shape": [poses, 33, 4],
+            "data": base64 little endian float32 normalized x, y, z, visibility } (see lib/keypoints.encode_frame)
+        node (str): Edge node id, becomes the producer of its sources
+    Returns:
+        json: "frames" with { "source", "risk" } per ingested frame
+    """
+    # Preflight
+    if request.method == "OPTIONS":
+        return ("", 204)
+    try:
+        # Retrieve and validate params
+        params = request.get_json(silent=True) or {}
+        frames = params.get("frames")
+        if not isinstance(frames, list):
+            return user_error("Required param 'frames' not found.")
+        if len(frames) > KEYPOINTS_BATCH:
+            return user_error(f"Too many frames, max {KEYPOINTS_BATCH} per request.")
+        node = params.get("node") or request.remote_addr
+        
+        # Validate the whole batch before processing any frame
+        try:
+            frames = [decode_frame(frame) for frame in frames]
+        except ValueError as err:
+            return user_error(str(err))
+        
+        results = []
+        newest = {}
+        for source, landmarks, ts, tracks in frames:
+            risk = process_landmarks(source, landmarks, ts, tracks)
+            results.append({ "source": source, "risk": risk })
+            # Rules fired anywhere in the batch are reported with the newest frame of the source
+            _, fired = newest.get(source, (None, []))
+            newest[source] = (landmarks, fired + [rule for rule in risk if rule not in fired])
+        
+        for source, (landmarks, risk) in newest.items():
+            # Edge node is the producer, dashboard viewers of the source get shared results
+            HUB.claim(source, f"edge:{node}")
+            # Expanding landmarks to detections costs as much as the rules, only for watched sources
+            if HUB.has_subscribers(source):
+                HUB.publish(source, { "detections": array_to_detections(landmarks), "normalized": True, "risk": risk, "edge": True })
+        
+        return success({ "frames": results })
+    except Exception as err:
+        print(f"Keypoints ingest error: {str(err)}")
+        return server_error(f"Keypoints ingest error: {str(err)}")
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
     
 
 @app.route('/vision/segment', methods=['POST'])
@@ -249,7 +476,6 @@ def segment_touch():
     # Preflight
     if request.method == "OPTIONS":
         return ("", 204)
-    global mp
     try:
         # Retrieve and validate params        
         if 'image' not in request.files:
@@ -268,16 +494,104 @@ def segment_touch():
         y = float(params.get("y"))
         normalized = params.get("normalized") or False
             
-        # Request inference
-        results = mp.interactive_segmentation(image, x, y, normalized)
+        # Request inference on the segmentation lane, live pose keeps its own workers
+        try:
+            results, queue_ms = SEGMENT_LANE.run(lambda engine: engine.interactive_segmentation(image, x, y, normalized))
+        except LaneFull:
+            return busy("Segmentation engine busy, retry later.")
             
-        return success({ "detections": results })
+        return success({ "detections": results, "queue_ms": queue_ms })
     except Exception as err:
         print(f"Touch segmentation error: {str(err)}")
         return server_error(f"Touch segmentation error: {str(err)}")
 # --------------------------------------------------------------------
 # --------------------------------------------------------------------
 
+@app.route('/streams/<source>', methods=['GET'])
+def stream_results(source):
+    """
+    Subscribe to a source pose results (server sent events)
+    ---
+    Args:
+        source* (str): Source id
+        thumbnails (bool): Include annotated thumbnails
+        buffer (int): Results buffered for this client before dropping the oldest, defaults to 4
+    """
+    try:
+        thumbnails = request.args.get("thumbnails", "false").lower() == "true"
+        buffer = min(max(request.args.get("buffer", 4, type=int), 1), 64)
+        sub = HUB.subscribe(source, buffer, thumbnails)
+    except Exception as err:
+        print(f"Stream subscribe error: {str(err)}")
+        return server_error(f"Stream subscribe error: {str(err)}")
+
+    def events():
+        try:
+            # Start with the latest known result
+            latest = HUB.latest(source)
+            if latest is not None:
+                yield f"data: {json.dumps(latest)}\n\n"
+            while True:
+                item = sub.get(timeout=15)
+                # Heartbeat keeps proxies from closing idle streams
+                yield f"data: {json.dumps(item)}\n\n" if item is not None else ": keepalive\n\n"
+        finally:
+            sub.close()
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream", headers={ "Cache-Control": "no-cache" })
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+@app.route('/streams', methods=['GET'])
+def streams_status():
+    """
+    Producer, subscribers and dropped results per source
+    ---
+    """
+    try:
+        return success({ "data": HUB.stats() })
+    except Exception as err:
+        print(f"Streams status error: {str(err)}")
+        return server_error(f"Streams status error: {str(err)}")
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+@app.route('/lanes', methods=['GET'])
+def lanes_status():
+    """
+    Queue depth, busy workers and wait times per execution lane
+    ---
+    """
+    try:
+        now = time.time()
+        return success({
+            "data": { "pose": POSE_LANE.stats(), "segment": SEGMENT_LANE.stats() },
+            "at_risk": [source for source, until in AT_RISK.items() if until > now]
+        })
+    except Exception as err:
+        print(f"Lanes status error: {str(err)}")
+        return server_error(f"Lanes status error: {str(err)}")
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+@app.route('/qos', methods=['GET'])
+def qos_status():
+    """
+    Quality level and smoothed latency against the budget per source
+    ---
+    """
+    try:
+        return success({ "data": QOS.status() })
+    except Exception as err:
+        print(f"QoS status error: {str(err)}")
+        return server_error(f"QoS status error: {str(err)}")
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
 # ----------------------------------------
 # --------------- FENCES STORAGE STUFF ---
 # ----------------------------------------
@@ -295,19 +609,29 @@ def save_fence():
         params = request.get_json()
         
         if "id" not in params:
-            user_error('Missing required param "id".')
+            return user_error('Missing required param "id".')
         if "data" not in params:
-            user_error('Missing required param "data".')
+            return user_error('Missing required param "data".')
             
         id = params["id"]
         data = params["data"]
         
+        # Reject fences whose rules don't compile, a bed must never go unchecked
+        if isinstance(data, dict) and "bbox" in data:
+            try:
+                compile_fence(data)
+            except ValueError as err:
+                return user_error(str(err))
+        
         # Update fence
-        FENCES[id] = data
-        update_file("fences", FENCES)
+        with FILES_LOCK:
+            FENCES[id] = data
+            update_file("fences", FENCES)
+            RULES.load(FENCES)
+            data = dict(FENCES)
         
         # Return response
-        return success({ "message": "Fence have been saved succesfully.", "data": FENCES })
+        return success({ "message": "Fence have been saved succesfully.", "data": data })
     except Exception as err:
         print(f"Save fence error: {str(err)}")
         return server_error(f"Save fence error: {str(err)}")
@@ -343,16 +667,19 @@ def remove_fence():
         params = request.get_json()
         
         if "id" not in params:
-            user_error('Missing required param "id".')
+            return user_error('Missing required param "id".')
             
         id = params["id"]
         
         # Remove fence
-        del FENCES[id]
-        update_file("fences", FENCES)
+        with FILES_LOCK:
+            del FENCES[id]
+            update_file("fences", FENCES)
+            RULES.load(FENCES)
+            data = dict(FENCES)
         
         # Return response
-        return success({ "message": "Fence have been deleted succesfully.", "data": FENCES })
+        return success({ "message": "Fence have been deleted succesfully.", "data": data })
     except Exception as err:
         print(f"Save fence error: {str(err)}")
         return server_error(f"Save fence error: {str(err)}")
@@ -378,22 +705,24 @@ def save_alert():
         params = request.get_json()
         
         if "id" not in params:
-            user_error('Missing required param "id".')
+            return user_error('Missing required param "id".')
         if "data" not in params:
-            user_error('Missing required param "data".')
+            return user_error('Missing required param "data".')
             
         id = params["id"]
         data = params["data"]
         
         # Update fence
-        ALERTS[id] = data
-        update_file("alerts", ALERTS)
+        with FILES_LOCK:
+            ALERTS[id] = data
+            update_file("alerts", ALERTS)
+            data = dict(ALERTS)
         
         # Return response
-        return success({ "message": "Fence have been saved succesfully.", "data": ALERTS })
+        return success({ "message": "Fence have been saved succesfully.", "data": data })
     except Exception as err:
         print(f"Save fence error: {str(err)}")
-        server_error(f"Save fence error: {str(err)}")
+        return server_error(f"Save fence error: {str(err)}")
 # --------------------------------------------------------------------
 # --------------------------------------------------------------------
 
@@ -409,7 +738,7 @@ def load_alert():
         return success({ "data": get_file("alerts") })
     except Exception as err:
         print(f"Load alerts error: {str(err)}")
-        server_error(f"Load alerts error: {str(err)}")
+        return server_error(f"Load alerts error: {str(err)}")
 # --------------------------------------------------------------------
 # --------------------------------------------------------------------
 
@@ -426,19 +755,21 @@ def remove_alert():
         params = request.get_json()
         
         if "id" not in params:
-            user_error('Missing required param "id".')
+            return user_error('Missing required param "id".')
             
         id = params["id"]
         
         # Remove alert
-        del ALERTS[id]
-        update_file("alerts", ALERTS)
+        with FILES_LOCK:
+            del ALERTS[id]
+            update_file("alerts", ALERTS)
+            data = dict(ALERTS)
         
         # Return response
-        return success({ "message": "Fence have been deleted succesfully.", "data": ALERTS })
+        return success({ "message": "Fence have been deleted succesfully.", "data": data })
     except Exception as err:
         print(f"Remove alert error: {str(err)}")
-        server_error(f"Remove alert error: {str(err)}")
+        return server_error(f"Remove alert error: {str(err)}")
 # --------------------------------------------------------------------
 # --------------------------------------------------------------------
 
@@ -511,9 +842,108 @@ def send_tg():
         return server_error(f"Telegram send error: {str(err)}")
 # --------------------------------------------------------------------
 # --------------------------------------------------------------------
-    
 
+
+# ----------------------------------------
+# --------------- INCIDENTS LOG STUFF ----
+# ----------------------------------------
+
+@app.route('/incidents/record', methods=['POST'])
+def record_incident():
+    """
+    Record an incident
+    ---
+    Args:
+        source* (str): Source id
+        type* (str): Incident type (outside_fence, wrist_above_elbow ...)
+        data (dict): Incident details
+        ts (float): Epoch seconds, defaults to now
+    """
+    try:
+        params = request.get_json()
+        
+        if "source" not in params or "type" not in params:
+            return user_error(f"Missing required parameter {'source' if 'source' not in params else 'type'}.")
+        ts = params.get("ts")
+        if ts is not None and (isinstance(ts, bool) or not isinstance(ts, (int, float)) or not math.isfinite(ts)):
+            return user_error("Parameter 'ts' must be epoch seconds.")
+        
+        item = INCIDENTS.append(params["source"], params["type"], params.get("data"), params.get("ts"))
+        # Serve this source first while at risk
+        mark_risk(params["source"])
+        
+        # Return response (coalesced repeats are not stored twice)
+        return success({ "data": item, "coalesced": item is None })
+    except Exception as err:
+        print(f"Record incident error: {str(err)}")
+        return server_error(f"Record incident error: {str(err)}")
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+@app.route('/incidents/query', methods=['GET'])
+def query_incidents():
+    """
+    Query incidents, newest first
+    ---
+    Args:
+        source (str): Source id, all sources if not provided
+        start (float): From epoch seconds
+        end (float): To epoch seconds
+        hours (float): Last hours, used when start is not provided
+        limit (int): Page size, defaults to 100 (max 1000)
+        cursor (str): "next" value of the previous page
+    """
+    try:
+        params = request.args
+        
+        bounds = {}
+        for name in ("start", "end", "hours"):
+            try:
+                bounds[name] = None if params.get(name) is None else float(params[name])
+            except ValueError:
+                bounds[name] = float("nan")
+            if bounds[name] is not None and not math.isfinite(bounds[name]):
+                return user_error(f"Parameter '{name}' must be a number.")
+        start, end, hours = bounds["start"], bounds["end"], bounds["hours"]
+        if start is None and hours is not None:
+            start = time.time() - hours * 3600
+        limit = min(max(params.get("limit", 100, type=int), 1), 1000)
+        
+        try:
+            items, cursor = INCIDENTS.query(params.get("source"), start, end, limit, params.get("cursor"))
+        except ValueError as err:
+            return user_error(str(err))
+        
+        # Return response
+        return success({ "data": items, "next": cursor })
+    except Exception as err:
+        print(f"Query incidents error: {str(err)}")
+        return server_error(f"Query incidents error: {str(err)}")
+# --------------------------------------------------------------------
+# --------------------------------------------------------------------
+
+
+# ----------------------------------------
+# --------------- SHARED MEMORY STUFF ----
+# ----------------------------------------
+
+def start_shm_transport():
+    """
+    Serve raw frames written by local capture processes (cam.py) to shared memory.
+    """
+    server = FrameServer(
+        SHM_ADDRESS,
+        lambda source, frame, normalized: infer_pose(source, frame, normalized)[0],
+        authkey=TOKEN.encode("utf-8"),
+        debug=True
+    )
+    print(f"Shared memory transport listening on {server.address}")
+    return server.start()
     
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8080, debug=True)
\ No newline at end of file
+    # Debug reloader imports this module twice, listen only from the serving process
+    if SHM_ADDRESS and (os.getenv("WERKZEUG_RUN_MAIN") == "true" or not DEBUG):
+        start_shm_transport()
+    app.run(host="0.0.0.0", port=PORT, debug=DEBUG, threaded=True)
\ No newline at end of file
@@ -189,6 +189,49 @@ const serverRemoveAlert = (id, callback) => {
 
 
 
+/******************************************************************************************** *
+ * ********************************** INCIDENTS STUFF *************************************** *
+ * *******************************************************************************************/
+
+/**
+ * Query incidents from server, newest first
+ * @param {object} query { source, start, end, hours, limit, cursor }
+ * @param {function} callback Function to execute with (incidents, next cursor).
+ */
+const serverQueryIncidents = (query, callback) => {
+    const params = new URLSearchParams(Object.entries(query).filter(([k, v]) => v !== undefined && v !== null));
+    fetch(`/incidents/query?${params}`)
+        .then(req => req.json())
+        .then(res => {
+            if (res.error) console.error(`Error loading incidents from server due to: ${res.error}`);
+            if (callback && typeof(callback) == "function") callback(res.data, res.next);
+            return res.data;
+        })
+}
+
+
+/******************************************************************************************** *
+ * ********************************** STREAMS STUFF ***************************************** *
+ * *******************************************************************************************/
+
+/**
+ * Subscribe to a source pose results pushed by the server
+ * @param {str} source Source id
+ * @param {function} callback Function to execute with each result.
+ * @param {boolean} thumbnails Include annotated thumbnails
+ * @returns {EventSource} Call close() to unsubscribe
+ */
+const serverSubscribeSource = (source, callback, thumbnails = false) => {
+    const events = new EventSource(`/streams/${encodeURIComponent(source)}?thumbnails=${thumbnails}`);
+    events.onmessage = e => {
+        if (callback && typeof(callback) == "function") callback(JSON.parse(e.data));
+    };
+    events.onerror = err => console.error(`Stream error for source ${source}:`, err);
+    return events;
+}
+
+
+
 export {
     serverLoadFences,
     serverUpdateFence,
@@ -197,5 +240,7 @@ export {
     serverUpdateAlert,
     serverRemoveAlert,
     sendViaGmail,
-    sendViaTelegram
+    sendViaTelegram,
+    serverQueryIncidents,
+    serverSubscribeSource
 }
\ No newline at end of file
@@ -1,4 +1,4 @@
-import { serverLoadFences, serverUpdateFence, serverRemoveFence, serverLoadAlerts, serverUpdateAlert, serverRemoveAlert, sendViaGmail, sendViaTelegram } from "./backend.js";
+import { serverLoadFences, serverUpdateFence, serverRemoveFence, serverLoadAlerts, serverUpdateAlert, serverRemoveAlert, sendViaGmail, sendViaTelegram, serverSubscribeSource } from "./backend.js";
 
 // MENU
 const $activeSources = document.querySelector("#sources");
@@ -70,6 +70,16 @@ let FENCES = [];
 let ALERTS = [];
 
 
+/** Viewer id, the server lets a single viewer per source run inference */
+const CLIENT_ID = crypto.randomUUID();
+/** Results pushed by the server for sources inferred by another viewer */
+const SUBSCRIPTIONS = {};
+/** Shared results older than this (ms) mean the producer is gone */
+const SHARED_TIMEOUT = 2000;
+/** Pause (ms) before sending frames of a source again after a busy (429) answer */
+const BUSY_BACKOFF = 250;
+
+
 
 /* *********************************************************************************
 ********************************** UI/UX STUFF *************************************
@@ -610,6 +620,17 @@ const pipeline = () => {
     // Build frames
     const framesPromise = [];
     for (let src of monitoring) {
+        // Another viewer infers this source, use its pushed results
+        const sub = SUBSCRIPTIONS[src.id];
+        if (sub && sub.latest && Date.now() - sub.latest.received < SHARED_TIMEOUT) {
+            // Same pushed result is redrawn every frame but processed (rules, alerts) only once
+            const fresh = sub.latest.ts !== sub.processedTs;
+            sub.processedTs = sub.latest.ts;
+            framesPromise.push(Promise.resolve({ src: src, shared: sub.latest, fresh: fresh }));
+            continue;
+        }
+        // Server shedding load, skip this source for a moment
+        if (src.busyUntil && Date.now() < src.busyUntil) continue;
         framesPromise.push(new Promise((resolve,reject) => {
             getFrame(VIDS[src.id], 640, 480)
                 .then(res => resolve({ src: src, frame: res }))
@@ -626,20 +647,28 @@ const pipeline = () => {
                 const posePromises = [];
                 for (let res of responses) {
                     if (res == null) continue;
-                    posePromises.push(new Promise((resolve) => {
-                        requestPose(res.frame)
-                            .catch(err => {
-                                console.error(err)
-                                resolve(null)
-                            })
+                    if (res.shared) {
+                        posePromises.push(Promise.resolve({ ...res.shared, src: res.src, stale: !res.fresh }));
+                        continue;
+                    }
+                    posePromises.push(
+                        requestPose(res.frame, res.src)
                             .then(det => {
+                                // Busy or failed request, skip this frame
+                                if (!det) return null;
                                 det.src = res.src;
-                                resolve(det);
+                                // Follow the source producer instead of uploading frames
+                                if (det.producer === false) subscribeSource(res.src);
+                                else if (det.producer) unsubscribeSource(res.src);
+                                return det;
+                            })
+                            .catch(err => {
+                                console.error(err);
+                                return null;
                             })
-                    }))
+                    );
                 }
-                Promise.all(posePromises)
-                    .catch(err => console.error(err))
+                return Promise.all(posePromises)
                     .then(dets => {
                         // Clear all canvases
                         for (let src of activeSourcesList) {
@@ -647,37 +676,76 @@ const pipeline = () => {
                         }
                         // Draw each box and keypoints
                         for (let det of dets) {
+                            if (!det) continue;
                             // Draw fence
                             const fence = drawBbox(det.src);
                             // Draw pose
                             const keyp = drawPose(det.detections, det.src);
-                            // Check for collisions
-                            checkCollision(fence, keyp, det.src);
+                            // Check fence rules results, once per result
+                            if (!det.stale) checkCollision(fence, det.risk, det.src);
                         }
-                        console.timeEnd("pipeline time");
-                        requestAnimationFrame(pipeline);
                     })
             })
-        .catch(err => console.error(err));
+        .catch(err => console.error(err))
+        .finally(() => {
+            // Keep monitoring whatever happened with this frame
+            console.timeEnd("pipeline time");
+            requestAnimationFrame(pipeline);
+        });
+}
+
+
+/**
+ * Subscribe to the results of a source inferred by another viewer
+ * @param {object} src Video source object
+ */
+const subscribeSource = (src) => {
+    if (SUBSCRIPTIONS[src.id]) return;
+    const sub = { latest: null };
+    sub.events = serverSubscribeSource(src.id, res => {
+        res.received = Date.now();
+        sub.latest = res;
+    });
+    SUBSCRIPTIONS[src.id] = sub;
+}
+
+
+/**
+ * Stop following a source, this viewer infers it now
+ * @param {object} src Video source object
+ */
+const unsubscribeSource = (src) => {
+    const sub = SUBSCRIPTIONS[src.id];
+    if (!sub) return;
+    sub.events.close();
+    delete SUBSCRIPTIONS[src.id];
 }
 
 
 /**
  * Performs pose detection on the backend
  * @param {blob} frame Current video frame 
+ * @param {object} src Video source object
  * @returns 
  */
-const requestPose = async (frame) => {
+const requestPose = async (frame, src) => {
     if (!frame) return;
     // Build form
     const form = new FormData();
     form.append("image", frame);
     form.append("normalized", true);
+    form.append("source", src.id);
+    form.append("client", CLIENT_ID);
     // Send request
     const request = await fetch("/vision/pose", {
             method: "POST",
             body: form
         })
+    // Engine busy (429) or request failed, the pipeline skips this frame
+    if (!request.ok) {
+        if (request.status == 429) src.busyUntil = Date.now() + BUSY_BACKOFF;
+        return null;
+    }
     // Process response
     const response = await request.json();
     return response;
@@ -685,37 +753,24 @@ const requestPose = async (frame) => {
 
 
 /**
- * Check for collisions between the user with his respective fence
- * @param {object} fence User fence
- * @param {object} pose User pose
+ * Alert on the fence alerting rules fired for the user, rules are evaluated on the server
+ * (every fired rule is still recorded as an incident)
+ * @param {object} fence User fence, alert_rules defaults to ["outside_fence"]
+ * @param {array} risk Fired rule names returned with the pose
  * @param {object} src Video source object
  * @returns 
  */
-const checkCollision = (fence, pose, src) => {
-    if (!fence || !pose || !src.alert) return;
-    // Filter keypoints outside visible area
-    const kpFiltered = pose.filter(kp => kp.x < 1 && kp.y < 1);
-    // Retrieve fence bbox
-    const [minx , maxx, miny, maxy] = fence.bbox;
-    // check for collision
-    for (let kp of kpFiltered) {
-        if (
-            kp.x < minx ||
-            kp.x > maxx ||
-            kp.y < miny ||
-            kp.y > maxy
-        ){
-            // Search alert
-            // Retrieve image
-            getFrame(VIDS[src.id], 1280, 720, true)
-                .then(img => {
-                    // Process alert
-                    
-                    testAlert(`The user on the fence: '${src.fence}', is under high fall risk.`, [{name: "evicende.jpg", contentType: "image/jpeg", base64: img.split(",")[1]}]);
-                });
-            break;
-        }
-    }
+const checkCollision = (fence, risk, src) => {
+    if (!fence || !risk || !src.alert) return;
+    const alerting = fence.alert_rules || ["outside_fence"];
+    risk = risk.filter(name => alerting.includes(name));
+    if (risk.length == 0) return;
+    // Retrieve image
+    getFrame(VIDS[src.id], 1280, 720, true)
+        .then(img => {
+            // Process alert
+            testAlert(`The user on the fence: '${src.fence}', is under high fall risk (${risk.join(", ")}).`, [{name: "evicende.jpg", contentType: "image/jpeg", base64: img.split(",")[1]}]);
+        });
 }
 
 const alertRequest = () => {